@@ -0,0 +1,11 @@
+import sys
+from particle_simulator import *
+
+# Compares the array-engine of the ensembles with the normal simulation on the example simulations and a few
+# synthetic scenes, eg. python EquivalenceCheck.py 100 results.csv
+if __name__ == '__main__':
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    reports = equivalence.run_all(frames=frames)
+    equivalence.print_reports(reports)
+    if len(sys.argv) > 2:
+        sweep.write_csv(reports, sys.argv[2])
@@ -0,0 +1,8 @@
+import sys
+from particle_simulator import *
+
+# Shows the frames of a simulation that was started with a stream-server, eg.
+# StreamServer(sim, port=5005) in ParticleSimulator.py, then: python StreamViewer.py 127.0.0.1 5005
+host = sys.argv[1] if len(sys.argv) > 1 else '127.0.0.1'
+port = int(sys.argv[2]) if len(sys.argv) > 2 else 5005
+streaming.view(host, port)
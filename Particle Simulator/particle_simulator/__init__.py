@@ -1,8 +1,10 @@
-from tkinter.filedialog import asksaveasfilename, askopenfilename
-from pynput.keyboard import Listener, Key, KeyCode
+import time
+IMPORT_START = time.perf_counter()
+STARTUP_TIMES = {}
+
+from particle_simulator.lazy import LazyModule
 from tkinter import colorchooser
 from tkinter import messagebox
-import PIL.Image, PIL.ImageTk
 import tkinter.font as tkfont
 from tkinter import ttk
 from tkinter import *
@@ -10,13 +12,33 @@ import numpy as np
 import threading
 import random
 import pickle
-import time
 import math
-import cv2
 import os
 
-from particle_simulator.grid import Grid
-from particle_simulator.particle import Particle
+# Only imported when they are first used, headless runs never need most of them
+cv2 = LazyModule('cv2')
+PIL = LazyModule('PIL', 'PIL.Image', 'PIL.ImageTk')
+keyboard = LazyModule('pynput.keyboard')
+filedialog = LazyModule('tkinter.filedialog')
+gzip = LazyModule('gzip')
+
+from particle_simulator.grid import Grid, HashGrid
+from particle_simulator.particle import Particle, ATTRIBUTE_NAMES, settings_to_columns
+from particle_simulator.colliders import SegmentCollider, CircleCollider, SDFCollider, bake_sdf, collider_from_dict
+from particle_simulator.emitter import Emitter, Sink, emitter_from_dict
+from particle_simulator.camera import Camera
+from particle_simulator.history import History
+from particle_simulator.settings import Settings, SIM_SETTINGS
+from particle_simulator.observables import Observables
+from particle_simulator.streaming import StreamServer, StreamClient
+from particle_simulator.sharedState import SharedExport, SharedReader
 from particle_simulator.saveManager import SaveManager
 from particle_simulator.gui import GUI
 from particle_simulator.simulation import Simulation
+scenes = LazyModule('particle_simulator.scenes')
+sweep = LazyModule('particle_simulator.sweep')
+ensemble = LazyModule('particle_simulator.ensemble')
+recorder = LazyModule('particle_simulator.recorder')
+equivalence = LazyModule('particle_simulator.equivalence')
+
+STARTUP_TIMES['imports'] = time.perf_counter() - IMPORT_START
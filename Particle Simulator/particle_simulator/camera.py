@@ -0,0 +1,68 @@
+from particle_simulator import *
+
+
+class Camera:
+    # Maps world-coordinates (particles, edges, grid) to pixels of the canvas and back
+    def __init__(self, sim):
+        self.sim = sim
+        self.x, self.y = 0, 0  # world-position of the top-left corner of the canvas
+        self.zoom = 1
+        self.min_zoom = 1e-4
+        self.max_zoom = 100
+        self.follow = False  # keeps the selection in the center
+        self.pan_start = None
+
+    def to_world(self, x, y):
+        return x / self.zoom + self.x, y / self.zoom + self.y
+
+    def to_screen(self, x, y):
+        return int((x - self.x) * self.zoom), int((y - self.y) * self.zoom)
+
+    def to_screen_array(self, points):
+        return np.round((np.asarray(points) - [self.x, self.y]) * self.zoom).astype(np.int32)
+
+    def return_view(self):
+        # Visible area in world-coordinates: x0, y0, x1, y1
+        return self.x, self.y, self.x + self.sim.canvas_width / self.zoom, self.y + self.sim.canvas_height / self.zoom
+
+    def world_event(self, function):
+        # Wraps a mouse-callback so it gets the world-position of the event
+        def callback(event):
+            event.x, event.y = self.to_world(event.x, event.y)
+            return function(event)
+        return callback
+
+    def zoom_at(self, factor, x, y):
+        # The world-point under the screen-position (x, y) stays where it is
+        wx, wy = self.to_world(x, y)
+        self.zoom = min(max(self.zoom * factor, self.min_zoom), self.max_zoom)
+        self.x, self.y = wx - x / self.zoom, wy - y / self.zoom
+
+    def center_on(self, x, y):
+        self.x = x - self.sim.canvas_width / 2 / self.zoom
+        self.y = y - self.sim.canvas_height / 2 / self.zoom
+
+    def fit(self, x0, y0, x1, y1):
+        self.zoom = min(max(min(self.sim.canvas_width / max(x1 - x0, 1e-9),
+                                self.sim.canvas_height / max(y1 - y0, 1e-9)), self.min_zoom), self.max_zoom)
+        self.center_on((x0 + x1) / 2, (y0 + y1) / 2)
+
+    def reset(self):
+        self.x, self.y = 0, 0
+        self.zoom = 1
+        self.follow = False
+
+    def pan_p(self, event):
+        self.pan_start = (event.x, event.y)
+
+    def pan_m(self, event):
+        if self.pan_start is not None:
+            self.x -= (event.x - self.pan_start[0]) / self.zoom
+            self.y -= (event.y - self.pan_start[1]) / self.zoom
+            self.pan_start = (event.x, event.y)
+            self.follow = False
+
+    def update(self):
+        if self.follow and len(self.sim.selection) > 0:
+            self.center_on(sum(p.x for p in self.sim.selection) / len(self.sim.selection),
+                           sum(p.y for p in self.sim.selection) / len(self.sim.selection))
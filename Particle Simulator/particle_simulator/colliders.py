@@ -0,0 +1,213 @@
+from particle_simulator import *
+from abc import ABC, abstractmethod
+
+
+class Collider(ABC):
+    def __init__(self, color=None, width=2):
+        self.color = [100] * 3 if color is None else list(color)
+        self.width = width
+        self.min = np.zeros(2)
+        self.max = np.zeros(2)
+
+    @abstractmethod
+    def signed_distance(self, positions):
+        pass
+
+    def sweep(self, positions, previous):
+        return positions
+
+    def collide(self, particles, positions, previous, radii, friction):
+        # Only particles whose (swept) bounding box overlaps the collider's need the exact distance
+        near = np.nonzero(np.all((np.maximum(positions, previous) + radii[:, None] >= self.min) &
+                                 (np.minimum(positions, previous) - radii[:, None] <= self.max), axis=1))[0]
+        if len(near) == 0:
+            return
+
+        positions[near] = self.sweep(positions[near], previous[near])
+        distance, normal = self.signed_distance(positions[near])
+        hit = distance < radii[near]
+        indices, distance, normal = near[hit], distance[hit], normal[hit]
+        if len(indices) == 0:
+            return
+
+        positions[indices] += normal * (radii[indices] - distance)[:, None]
+
+        hit_particles = [particles[i] for i in indices]
+        velocities = np.array([p.v for p in hit_particles], dtype='float64')
+        bounciness = np.array([p.bounciness for p in hit_particles])
+
+        normal_speed = np.einsum('ij,ij->i', velocities, normal)
+        normal_velocity = normal_speed[:, None] * normal
+        tangent_velocity = (velocities - normal_velocity) * (1 - friction)
+        approaching = (normal_speed < 0)[:, None]
+        velocities = np.where(approaching, tangent_velocity - bounciness[:, None] * normal_velocity,
+                              tangent_velocity + normal_velocity)
+
+        for p, (x, y), v in zip(hit_particles, positions[indices].tolist(), velocities):
+            p.x, p.y = x, y
+            p.v[:] = v
+
+    @abstractmethod
+    def draw(self, image, camera):
+        pass
+
+    @abstractmethod
+    def return_dict(self):
+        pass
+
+
+class SegmentCollider(Collider):
+    def __init__(self, points, closed=False, color=None, width=2):
+        super().__init__(color, width)
+        self.points = np.array(points, dtype='float64').reshape(-1, 2)
+        self.closed = closed
+        self.start = None
+        self.direction = None
+        self.length_sq = None
+        self.init_constants()
+
+    def init_constants(self):
+        points = np.vstack([self.points, self.points[:1]]) if self.closed else self.points
+        self.start = points[:-1]
+        self.direction = points[1:] - points[:-1]
+        self.length_sq = np.maximum(np.einsum('ij,ij->i', self.direction, self.direction), 1e-12)
+        self.min = self.points.min(axis=0)
+        self.max = self.points.max(axis=0)
+
+    def signed_distance(self, positions):
+        offset = positions[:, None, :] - self.start[None, :, :]
+        t = np.clip(np.einsum('ijk,jk->ij', offset, self.direction) / self.length_sq, 0, 1)
+        diff = offset - t[..., None] * self.direction
+        distances = np.sqrt(np.einsum('ijk,ijk->ij', diff, diff))
+
+        closest = distances.argmin(axis=1)
+        rows = np.arange(len(positions))
+        distance = distances[rows, closest]
+        diff = diff[rows, closest]
+
+        # Particles lying exactly on a segment get pushed out along its perpendicular
+        perpendicular = self.direction[closest][:, ::-1] * [-1, 1] / np.sqrt(self.length_sq[closest])[:, None]
+        on_line = distance < 1e-9
+        normal = np.where(on_line[:, None], perpendicular, diff / np.maximum(distance, 1e-9)[:, None])
+
+        return distance, normal
+
+    def sweep(self, positions, previous):
+        # Fast particles could otherwise tunnel through the (two-sided) segments in a single step
+        motion = positions - previous
+        offset = self.start[None, :, :] - previous[:, None, :]
+        denominator = motion[:, None, 0] * self.direction[None, :, 1] - motion[:, None, 1] * self.direction[None, :, 0]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = (offset[..., 0] * self.direction[None, :, 1] - offset[..., 1] * self.direction[None, :, 0]) / denominator
+            u = (offset[..., 0] * motion[:, None, 1] - offset[..., 1] * motion[:, None, 0]) / denominator
+        crossing = (denominator != 0) & (t >= 0) & (t <= 1) & (u >= 0) & (u <= 1)
+        if not crossing.any():
+            return positions
+
+        t = np.where(crossing, t, np.inf).min(axis=1)
+        crossed = np.isfinite(t)
+        # Stop just in front of the segment, on the side the particle came from
+        t = np.maximum(t[crossed] - 1e-3, 0)
+        positions = positions.copy()
+        positions[crossed] = previous[crossed] + motion[crossed] * t[:, None]
+        return positions
+
+    def draw(self, image, camera):
+        cv2.polylines(image, [camera.to_screen_array(self.points)], self.closed, self.color, self.width)
+
+    def return_dict(self):
+        return {'type': 'SegmentCollider', 'points': self.points.copy(), 'closed': self.closed,
+                'color': self.color, 'width': self.width}
+
+
+class CircleCollider(Collider):
+    def __init__(self, x, y, radius, inside=False, color=None, width=2):
+        super().__init__(color, width)
+        self.x = x
+        self.y = y
+        self.r = radius
+        self.inside = inside
+        if inside:
+            # Particles anywhere outside the circle have to be pushed back in
+            self.min = np.full(2, -np.inf)
+            self.max = np.full(2, np.inf)
+        else:
+            self.min = np.array([x - radius, y - radius])
+            self.max = np.array([x + radius, y + radius])
+
+    def signed_distance(self, positions):
+        diff = positions - [self.x, self.y]
+        center_distance = np.sqrt(np.einsum('ij,ij->i', diff, diff))
+        normal = diff / np.maximum(center_distance, 1e-9)[:, None]
+        normal[center_distance < 1e-9] = [0, -1]
+        if self.inside:
+            return self.r - center_distance, -normal
+        return center_distance - self.r, normal
+
+    def draw(self, image, camera):
+        cv2.circle(image, camera.to_screen(self.x, self.y), int(self.r * camera.zoom), self.color, self.width)
+
+    def return_dict(self):
+        return {'type': 'CircleCollider', 'x': self.x, 'y': self.y, 'radius': self.r, 'inside': self.inside,
+                'color': self.color, 'width': self.width}
+
+
+class SDFCollider(Collider):
+    def __init__(self, values, origin=(0, 0), cell_size=1, color=None, width=2):
+        super().__init__(color, width)
+        self.values = np.array(values, dtype='float64')
+        self.origin = np.array(origin, dtype='float64')
+        self.cell_size = cell_size
+        self.gradient = None
+        self.contours = None
+        self.init_constants()
+
+    def init_constants(self):
+        rows, columns = self.values.shape
+        self.gradient = np.stack(np.gradient(self.values, self.cell_size)[::-1], axis=-1)
+        self.min = self.origin
+        self.max = self.origin + np.array([columns - 1, rows - 1]) * self.cell_size
+
+        mask = (self.values < 0).astype(np.uint8)
+        contours = cv2.findContours(mask, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)[-2]
+        self.contours = [c.reshape(-1, 2) * self.cell_size + self.origin for c in contours]
+
+    def sample(self, grid, positions):
+        rows, columns = self.values.shape
+        cell = (positions - self.origin) / self.cell_size
+        x0 = np.clip(np.floor(cell[:, 0]).astype(int), 0, columns - 2)
+        y0 = np.clip(np.floor(cell[:, 1]).astype(int), 0, rows - 2)
+        fx = np.clip(cell[:, 0] - x0, 0, 1)
+        fy = np.clip(cell[:, 1] - y0, 0, 1)
+        if grid.ndim == 3:
+            fx, fy = fx[:, None], fy[:, None]
+
+        top = grid[y0, x0] * (1 - fx) + grid[y0, x0 + 1] * fx
+        bottom = grid[y0 + 1, x0] * (1 - fx) + grid[y0 + 1, x0 + 1] * fx
+        return top * (1 - fy) + bottom * fy
+
+    def signed_distance(self, positions):
+        distance = self.sample(self.values, positions)
+        normal = self.sample(self.gradient, positions)
+        normal /= np.maximum(np.sqrt(np.einsum('ij,ij->i', normal, normal)), 1e-9)[:, None]
+        return distance, normal
+
+    def draw(self, image, camera):
+        cv2.polylines(image, [camera.to_screen_array(c) for c in self.contours], True, self.color, self.width)
+
+    def return_dict(self):
+        return {'type': 'SDFCollider', 'values': self.values.copy(), 'origin': self.origin.copy(),
+                'cell_size': self.cell_size, 'color': self.color, 'width': self.width}
+
+
+def bake_sdf(function, x0, y0, x1, y1, cell_size=5, **kwargs):
+    x, y = np.meshgrid(np.arange(x0, x1 + cell_size, cell_size), np.arange(y0, y1 + cell_size, cell_size))
+    return SDFCollider(function(x, y), origin=(x0, y0), cell_size=cell_size, **kwargs)
+
+
+def collider_from_dict(dictionary):
+    dictionary = dictionary.copy()
+    collider_type = dictionary.pop('type')
+    return {'SegmentCollider': SegmentCollider,
+            'CircleCollider': CircleCollider,
+            'SDFCollider': SDFCollider}[collider_type](**dictionary)
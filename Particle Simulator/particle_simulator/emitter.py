@@ -0,0 +1,136 @@
+from particle_simulator import *
+
+
+class Emitter:
+    def __init__(self, sim, x, y, rate=1, speed=2, angle=0, spread=20, speed_spread=0, width=0,
+                 max_particles=-1, **template):
+        self.sim = sim
+        self.x = x
+        self.y = y
+        self.rate = rate  # particles per step (at simulation speed 1)
+        self.speed = speed
+        self.angle = angle  # same convention as the gravity-angle: 0° points down
+        self.spread = spread
+        self.speed_spread = speed_spread
+        self.width = width
+        self.max_particles = max_particles
+        # The velocity of the particles comes from speed, angle and spread
+        self.template = {key: value for key, value in template.items() if key not in ['velocity', 'insert']}
+
+        self.pool = []
+        self.count = 0
+        self.accumulator = 0
+
+        self.sim.emitters.append(self)
+
+    def update(self):
+        self.accumulator += self.rate * self.sim.speed
+        amount = int(self.accumulator)
+        self.accumulator -= amount
+        if self.max_particles >= 0:
+            amount = min(amount, self.max_particles - (self.count - len(self.pool)))
+        if amount <= 0:
+            return
+
+        rng = self.sim.rng
+        angles = np.radians(self.angle + rng.uniform(-self.spread / 2, self.spread / 2, amount))
+        speeds = self.speed + rng.uniform(-self.speed_spread, self.speed_spread, amount)
+        velocities = np.column_stack([np.sin(angles), np.cos(angles)]) * speeds[:, None]
+
+        # Particles spawn along a line perpendicular to the emitting direction
+        rads = np.radians(self.angle)
+        offsets = rng.uniform(-self.width / 2, self.width / 2, amount)
+        xs = (self.x + offsets * math.cos(rads)).tolist()
+        ys = (self.y - offsets * math.sin(rads)).tolist()
+
+        particles = []
+        for x, y, velocity in zip(xs, ys, velocities):
+            if self.pool:
+                p = self.pool.pop()
+                p.respawn(x, y, velocity)
+            else:
+                p = Particle(self.sim, x, y, velocity=velocity, insert=False, **self.template)
+                p.pool = self.pool
+                self.count += 1
+            particles.append(p)
+
+        self.sim.insert_particles(particles)
+
+    def delete(self):
+        self.sim.emitters.remove(self)
+
+    def draw(self, image, camera):
+        # In pixels of the canvas
+        rads = np.radians(self.angle)
+        direction = np.array([math.sin(rads), math.cos(rads)])
+        normal = np.array([direction[1], -direction[0]])
+        center = np.array(camera.to_screen(self.x, self.y))
+        half_width = max(self.width / 2 * camera.zoom, 5)
+        cv2.line(image, tuple(np.round(center + normal * half_width).astype(int).tolist()),
+                 tuple(np.round(center - normal * half_width).astype(int).tolist()), [0, 160, 0], 2)
+        cv2.line(image, tuple(center.tolist()),
+                 tuple(np.round(center + direction * 12).astype(int).tolist()), [0, 160, 0], 2)
+
+    def return_dict(self, index_source='all'):
+        if isinstance(index_source, str) and index_source == 'all':
+            index_source = self.sim.particles
+        if not isinstance(index_source, dict):
+            index_source = {particle: i for i, particle in enumerate(index_source)}
+
+        dictionary = self.__dict__.copy()
+        del dictionary['sim']
+        del dictionary['pool']
+        dictionary.update(dictionary.pop('template'))
+        # Its particles that are still in the simulation, the pooled ones are created again when loading
+        dictionary['particles'] = [i for particle, i in index_source.items() if particle.pool is self.pool]
+
+        return dictionary
+
+
+def emitter_from_dict(sim, dictionary):
+    dictionary = dictionary.copy()
+    count = dictionary.pop('count', 0)
+    accumulator = dictionary.pop('accumulator', 0)
+    particles = [sim.particles[i] for i in dictionary.pop('particles', [])]
+
+    emitter = Emitter(sim, **dictionary)
+    for p in particles:
+        p.pool = emitter.pool
+    for _ in range(count - len(particles)):
+        p = Particle(sim, 0, 0, insert=False, **emitter.template)
+        p.pool = emitter.pool
+        emitter.pool.append(p)
+    emitter.count = max(count, len(particles))
+    emitter.accumulator = accumulator
+
+    return emitter
+
+
+class Sink:
+    def __init__(self, sim, x, y, radius=20):
+        self.sim = sim
+        self.x = x
+        self.y = y
+        self.r = radius
+
+        self.sim.sinks.append(self)
+
+    def update(self, positions):
+        inside = np.nonzero((positions[:, 0] - self.x) ** 2 + (positions[:, 1] - self.y) ** 2 <= self.r ** 2)[0]
+        for i in inside:
+            p = self.sim.particles[i]
+            if not p.locked and not p.mouse:
+                self.sim.despawn(p)
+
+    def delete(self):
+        self.sim.sinks.remove(self)
+
+    def draw(self, image, camera):
+        cv2.circle(image, camera.to_screen(self.x, self.y), int(self.r * camera.zoom), [200, 0, 0], 1)
+
+    def return_dict(self):
+        dictionary = self.__dict__.copy()
+        del dictionary['sim']
+        dictionary['radius'] = dictionary.pop('r')
+
+        return dictionary
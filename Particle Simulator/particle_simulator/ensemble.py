@@ -0,0 +1,200 @@
+from particle_simulator import *
+
+
+# Settings that can differ between the replicas, the others (locked, groups, ...) are shared by all of them
+REPLICA_ATTRIBUTES = ['m', 'r', 'bounciness', 'attr_r', 'repel_r', 'attr', 'repel',
+                      'link_attr_breaking_force', 'link_repel_breaking_force']
+REPLICA_SETTINGS = ['g', 'air_res', 'ground_friction', 'temperature']
+
+
+class Ensemble:
+    # K copies of the same scene, stepped together with a leading replica-axis on all arrays.
+    # Pair forces are calculated for all pairs at once from the positions at the start of the step, both particles
+    # get them in the same step. With the grid, the Simulation sometimes lets the later particle of a pair calculate
+    # it, the earlier one then gets its reaction-force one step late, so the two only match exactly without the grid.
+    # Features that aren't simulated are rejected by from_simulation().
+    def __init__(self, particles, replicas, seed=None, g=0.1, g_dir=(0, 1), wind_force=(0, 0), air_res=0.05,
+                 ground_friction=0, temperature=0, speed=1, width=650, height=600, top=True, bottom=True, left=True,
+                 right=True):
+        if any(p.collision_bool for p in particles):
+            raise NotImplementedError("Ensembles don't support particle-collisions")
+
+        self.replicas = replicas
+        self.width = width
+        self.height = height
+        self.top, self.bottom, self.left, self.right = top, bottom, left, right
+        self.speed = speed
+        self.g_dir = np.array(g_dir, dtype='float64')
+        self.wind_force = np.array(wind_force, dtype='float64')
+        for key, value in zip(REPLICA_SETTINGS, [g, air_res, ground_friction, temperature]):
+            vars(self)[key] = np.full(replicas, value, dtype='float64')
+
+        self.rngs = [np.random.default_rng(seed_sequence)
+                     for seed_sequence in np.random.SeedSequence(seed).spawn(replicas)]
+
+        amount = len(particles)
+        self.position = np.tile(np.array([[p.x, p.y] for p in particles], dtype='float64'), (replicas, 1, 1))
+        self.v = np.tile(np.array([p.v for p in particles], dtype='float64'), (replicas, 1, 1))
+        for key in REPLICA_ATTRIBUTES:
+            vars(self)[key] = np.tile(np.array([vars(p)[key] for p in particles], dtype='float64'), (replicas, 1))
+
+        self.locked = np.array([p.locked for p in particles], dtype=bool)
+        self.gravity_mode = np.array([p.gravity_mode for p in particles], dtype=bool)
+        groups = {group: i for i, group in enumerate(dict.fromkeys(p.group for p in particles))}
+        group = np.array([groups[p.group] for p in particles])
+        separate_group = np.array([p.separate_group for p in particles], dtype=bool)
+        linked_group_particles = np.array([p.linked_group_particles for p in particles], dtype=bool)
+
+        # Every pair (i, j) is calculated by i like in Particle.update, unless i is locked
+        i, j = np.triu_indices(amount, 1)
+        swap = self.locked[i] & ~self.locked[j]
+        i, j = np.where(swap, j, i), np.where(swap, i, j)
+        keep = ~(self.locked[i] & self.locked[j])
+        self.i, self.j = i[keep], j[keep]
+
+        self.in_group = ~separate_group[self.i] & (group[self.i] == group[self.j])
+        self.skip = ~linked_group_particles[self.i] & self.in_group
+        self.gravity = self.gravity_mode[self.i] | self.gravity_mode[self.j]
+
+        # Rest lengths of the links, NaN for normal ('repel') links
+        indices = {p: index for index, p in enumerate(particles)}
+        pair_index = {(a, b): index for index, (a, b) in enumerate(zip(self.i.tolist(), self.j.tolist()))}
+        linked = np.zeros(len(self.i), dtype=bool)
+        self.rest = np.full(len(self.i), np.nan)
+        for a, p in enumerate(particles):
+            for link, length in p.link_lengths.items():
+                b = indices.get(link)
+                index = pair_index.get((a, b), pair_index.get((b, a)))
+                if index is not None:
+                    linked[index] = True
+                    if length != 'repel':
+                        self.rest[index] = length
+        self.linked = np.tile(linked, (replicas, 1))
+        self.broken_links = np.zeros(replicas, dtype=int)
+
+    def set_parameter(self, key, values):
+        # values: one for all replicas, one per replica or (for particle-settings) one per replica and particle
+        key = ATTRIBUTE_NAMES.get(key, key)
+        values = np.asarray(values, dtype='float64')
+        if key in REPLICA_SETTINGS:
+            vars(self)[key][:] = values
+        elif key in REPLICA_ATTRIBUTES:
+            vars(self)[key][:] = values[:, None] if values.ndim == 1 else values
+        else:
+            raise ValueError(f"'{key}' can't be set per replica")
+
+    def calc_pair_forces(self):
+        i, j = self.i, self.j
+        direction = self.position[:, j] - self.position[:, i]
+        distance = np.sqrt(np.einsum('kpi,kpi->kp', direction, direction))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            direction = np.where(distance[..., None] != 0, direction / distance[..., None], 0)
+
+        attr_r_i, attr_r_j = self.attr_r[:, i], self.attr_r[:, j]
+        attr_i, attr_j = self.attr[:, i], self.attr[:, j]
+        repel_i, repel_j = self.repel[:, i], self.repel[:, j]
+        active = (((attr_j != 0) | (repel_j != 0)) & ((attr_r_j < 0) | (distance < attr_r_j))) | \
+                 (((attr_i != 0) | (repel_i != 0)) & ((attr_r_i < 0) | (distance < attr_r_i)))
+        active &= ~(self.skip & ~self.linked) & (distance != 0)
+
+        repel_r = np.where(self.linked & ~np.isnan(self.rest), self.rest,
+                           np.maximum(self.repel_r[:, i], self.repel_r[:, j]))
+        rest_distance = np.abs(distance - repel_r)
+        repelling = distance < repel_r
+        with np.errstate(divide='ignore', invalid='ignore'):
+            attraction = np.where(self.gravity, (attr_i + attr_j) * self.m[:, i] * self.m[:, j] / distance ** 2 * 10,
+                                  (attr_i + attr_j) * rest_distance / 3000)
+        magnitude = np.where(repelling, -(repel_i + repel_j) * rest_distance / 10,
+                             np.where(self.in_group | self.linked, attraction, 0))
+        magnitude = np.where(active, magnitude, 0)
+
+        max_force = np.where(repelling, self.link_repel_breaking_force[:, j], self.link_attr_breaking_force[:, j])
+        broken = active & self.linked & (max_force >= 0) & (max_force <= np.abs(magnitude))
+        if broken.any():
+            self.linked &= ~broken
+            self.broken_links += broken.sum(axis=1)
+
+        return direction * magnitude[..., None]
+
+    def step(self, steps=1):
+        replicas, amount = self.m.shape
+        offsets = (np.arange(replicas) * amount)[:, None]
+        i, j = (self.i + offsets).ravel(), (self.j + offsets).ravel()
+        for _ in range(steps):
+            a = (self.g[:, None, None] * self.g_dir) * np.sign(self.m)[..., None]
+            a += self.wind_force * (self.r / np.abs(self.m))[..., None]
+
+            force = self.calc_pair_forces().reshape(-1, 2)
+            for axis in range(2):
+                a[..., axis] += (np.bincount(i, force[:, axis], replicas * amount) -
+                                 np.bincount(j, force[:, axis], replicas * amount)).reshape(replicas, amount) / \
+                                np.abs(self.m)
+
+            moving = ~self.locked
+            v = self.v[:, moving] + np.clip(a[:, moving], -2, 2) * self.speed
+            if self.temperature.any():
+                noise = np.stack([rng.uniform(-1, 1, (amount, 2)) for rng in self.rngs])[:, moving]
+                v += noise * (self.temperature * self.speed)[:, None, None]
+            v *= ((1 - self.air_res) ** self.speed)[:, None, None]
+            self.v[:, moving] = v
+            self.position[:, moving] += v * self.speed
+
+            self.apply_edges()
+
+    def apply_edges(self):
+        friction = 1 - self.ground_friction[:, None]
+        # Same order as in Particle.update: right, left, bottom, top
+        for enabled, axis, far_side in [(self.right, 0, True), (self.left, 0, False),
+                                        (self.bottom, 1, True), (self.top, 1, False)]:
+            if not enabled:
+                continue
+            position = self.position[..., axis]
+            size = self.width if axis == 0 else self.height
+            if far_side:
+                hit, limit = position + self.r >= size, size - self.r
+            else:
+                hit, limit = position - self.r <= 0, self.r
+            self.v[..., axis] = np.where(hit, self.v[..., axis] * -self.bounciness, self.v[..., axis])
+            self.v[..., 1 - axis] = np.where(hit, self.v[..., 1 - axis] * friction, self.v[..., 1 - axis])
+            self.position[..., axis] = np.where(hit, limit, position)
+
+    def apply(self, sim, replica=0):
+        # Writes one replica back into the (same) particles of a simulation, eg. to look at it
+        particles = sim.particles
+        for p, (x, y), v in zip(particles, self.position[replica].tolist(), self.v[replica]):
+            p.x, p.y = x, y
+            p.v = v.astype(sim.precision)
+        for p in particles:
+            p.linked = []
+            p.link_lengths = {}
+        for a, b, rest in zip(self.i[self.linked[replica]].tolist(), self.j[self.linked[replica]].tolist(),
+                              self.rest[self.linked[replica]].tolist()):
+            length = 'repel' if math.isnan(rest) else rest
+            particles[a].linked.append(particles[b])
+            particles[b].linked.append(particles[a])
+            particles[a].link_lengths[particles[b]] = length
+            particles[b].link_lengths[particles[a]] = length
+        sim.structure_changes += 1
+
+
+def check_supported(sim):
+    features = {'calculate_radii_diff': sim.calculate_radii_diff,
+                'void_edges': sim.void_edges,
+                'sleeping': sim.allow_sleeping,
+                'adaptive_timestep': sim.adaptive_timestep,
+                'far-field intervals': sim.far_field_interval > 1 or
+                                       any(interval > 1 for interval in sim.group_far_field_intervals.values()),
+                'colliders': len(sim.colliders) > 0,
+                'emitters': len(sim.emitters) > 0,
+                'sinks': len(sim.sinks) > 0}
+    unsupported = [name for name, used in features.items() if used]
+    if unsupported:
+        raise NotImplementedError(f"Ensembles don't support {', '.join(unsupported)}")
+
+
+def from_simulation(sim, replicas, seed=None):
+    check_supported(sim)
+    return Ensemble(sim.particles, replicas, seed, g=sim.g, g_dir=sim.g_dir, wind_force=sim.wind_force,
+                    air_res=sim.air_res, ground_friction=sim.ground_friction, temperature=sim.temperature,
+                    speed=sim.speed, width=sim.width, height=sim.height, top=sim.top, bottom=sim.bottom,
+                    left=sim.left, right=sim.right)
@@ -0,0 +1,143 @@
+from particle_simulator import *
+import glob
+
+EXAMPLES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'example_simulations')
+
+# Small scenes without randomness (or with a fixed seed) to compare engines on
+SYNTHETIC_SCENES = {'cloth': lambda: scenes.cloth(8, 6, spacing=20, x=100, y=100, link_attr_breaking_force=0.5),
+                    'rope': lambda: scenes.rope(20, spacing=15, x=200, y=50),
+                    'lattice': lambda: scenes.lattice(4, 6, x=250, y=200),
+                    'fluid_block': lambda: scenes.fluid_block(12, 8, x=100, y=300, seed=0),
+                    'orbit_system': lambda: scenes.orbit_system(325, 300, orbits=range(60, 260, 40))}
+
+
+def return_links(particles):
+    indices = {p: i for i, p in enumerate(particles)}
+    return {(i, indices[link]) for i, p in enumerate(particles) for link in p.linked if i < indices.get(link, -1)}
+
+
+class ReferenceEngine:
+    # Simulation.step(), with Particle.update and calc_attraction_force particle by particle
+    def __init__(self, sim):
+        self.sim = sim
+
+    def step(self):
+        self.sim.step()
+
+    def return_state(self):
+        particles = self.sim.particles
+        return {'positions': np.array([[p.x, p.y] for p in particles], dtype='float64').reshape(-1, 2),
+                'velocities': np.array([p.v for p in particles], dtype='float64').reshape(-1, 2),
+                'links': return_links(particles)}
+
+
+class EnsembleEngine:
+    # The array-engine of ensemble.py with a single replica
+    def __init__(self, sim):
+        self.ensemble = ensemble.from_simulation(sim, 1, seed=sim.seed)
+        # The ensemble leaves out pairs of locked particles, their links can't break anyway
+        self.locked_links = {(i, j) for i, j in return_links(sim.particles)
+                             if sim.particles[i].locked and sim.particles[j].locked}
+
+    def step(self):
+        self.ensemble.step()
+
+    def return_state(self):
+        linked = self.ensemble.linked[0]
+        i, j = self.ensemble.i[linked], self.ensemble.j[linked]
+        return {'positions': self.ensemble.position[0].copy(),
+                'velocities': self.ensemble.v[0].copy(),
+                'links': set(zip(np.minimum(i, j).tolist(), np.maximum(i, j).tolist())) | self.locked_links}
+
+
+def find_divergence(expected, actual, atol, rtol):
+    # Description of the first difference outside of the tolerances, None if there is none
+    if len(expected['positions']) != len(actual['positions']):
+        return f"{len(actual['positions'])} particles instead of {len(expected['positions'])}"
+    for quantity in ['positions', 'velocities']:
+        wrong = np.abs(actual[quantity] - expected[quantity]) > atol + rtol * np.abs(expected[quantity])
+        if wrong.any():
+            particle = int(np.flatnonzero(wrong.any(axis=1))[0])
+            return f'{quantity} of particle {particle}: {actual[quantity][particle].tolist()} ' \
+                   f'instead of {expected[quantity][particle].tolist()}'
+    if expected['links'] != actual['links']:
+        return f"links: {len(expected['links'] - actual['links'])} missing, " \
+               f"{len(actual['links'] - expected['links'])} extra"
+    return None
+
+
+def compare(load, candidate=EnsembleEngine, reference=ReferenceEngine, frames=100, seed=0, atol=1e-6, rtol=1e-5,
+            stop=True):
+    # load() has to return a new, identical simulation every time, each engine gets its own.
+    # Only the steps are timed, the comparisons aren't
+    engines = []
+    for engine in [reference, candidate]:
+        sim = load()
+        sim.set_seed(seed)
+        sim.paused = False
+        engines.append(engine(sim))
+
+    report = {'frames': 0, 'diverged_at': None, 'divergence': '', 'max_position_error': 0.0,
+              'max_velocity_error': 0.0}
+    times = [0.0, 0.0]
+    for frame in range(1, frames + 1):
+        for i, engine in enumerate(engines):
+            start = time.perf_counter()
+            engine.step()
+            times[i] += time.perf_counter() - start
+        report['frames'] = frame
+
+        expected, actual = [engine.return_state() for engine in engines]
+        if len(expected['positions']) == len(actual['positions']) and len(expected['positions']) > 0:
+            for quantity, key in [('positions', 'max_position_error'), ('velocities', 'max_velocity_error')]:
+                report[key] = max(report[key], float(np.abs(actual[quantity] - expected[quantity]).max()))
+
+        divergence = find_divergence(expected, actual, atol, rtol)
+        if divergence is not None and report['diverged_at'] is None:
+            report['diverged_at'] = frame
+            report['divergence'] = divergence
+            if stop:
+                break
+
+    report['reference_time'], report['candidate_time'] = times
+    report['speedup'] = times[0] / times[1] if times[1] > 0 else math.inf
+    return report
+
+
+def load_scene(scene, seed=0):
+    def load():
+        sim = Simulation(headless=True, seed=seed)
+        scene().build(sim)
+        return sim
+    return load
+
+
+def run_all(candidate=EnsembleEngine, frames=100, seed=0, filenames=None, synthetic=True, **kwargs):
+    # Compares the engines on the example simulations and the synthetic scenes, one report per scene
+    if filenames is None:
+        filenames = sorted(glob.glob(os.path.join(EXAMPLES, '*.sim')))
+    loaders = {os.path.basename(filename): lambda filename=filename: sweep.load_headless(filename)
+               for filename in filenames}
+    if synthetic:
+        loaders.update({name: load_scene(scene, seed) for name, scene in SYNTHETIC_SCENES.items()})
+
+    reports = []
+    for name, load in loaders.items():
+        try:
+            report = compare(load, candidate, frames=frames, seed=seed, **kwargs)
+        except NotImplementedError as error:
+            # Scenes the candidate can't simulate, eg. collisions in an ensemble
+            report = {'error': str(error)}
+        reports.append({'name': name, **report})
+    return reports
+
+
+def print_reports(reports):
+    for report in reports:
+        if 'error' in report:
+            print(f"{report['name']}: not supported ({report['error']})")
+        elif report['diverged_at'] is None:
+            print(f"{report['name']}: equal for {report['frames']} frames, speedup {report['speedup']:.2f}x")
+        else:
+            print(f"{report['name']}: diverged at frame {report['diverged_at']} ({report['divergence']}), "
+                  f"speedup {report['speedup']:.2f}x")
@@ -2,6 +2,8 @@ from particle_simulator import *
 
 
 class Grid:
+    bounded = True  # particles outside of the world aren't stored
+
     def __init__(self, sim, rows, columns):
         self.sim = sim
         self.grid = None
@@ -26,7 +28,7 @@ class Grid:
         return min(int(y // self.row_height), self.rows - 1)
 
     def return_column(self, x):
-        return min(int(x // self.column_width), self.rows - 1)
+        return min(int(x // self.column_width), self.columns - 1)
 
     def return_particles(self, particle):
         if particle.return_none:
@@ -51,3 +53,82 @@ class Grid:
                     near_particles += self.grid[i][j]
 
         return near_particles
+
+    def return_near_particles(self, particle, radius):
+        min_row = self.return_row(particle.y - radius)
+        max_row = self.return_row(particle.y + radius)
+        min_col = self.return_column(particle.x - radius)
+        max_col = self.return_column(particle.x + radius)
+
+        near_particles = []
+        for i in range(max(min_row, 0), min(max_row + 1, self.rows)):
+            for j in range(max(min_col, 0), min(max_col + 1, self.columns)):
+                near_particles += self.grid[i][j]
+
+        return near_particles
+
+    def return_particles_in(self, x0, y0, x1, y1):
+        near_particles = []
+        for row in self.grid[max(self.return_row(y0), 0):max(self.return_row(y1) + 1, 0),
+                             max(self.return_column(x0), 0):max(self.return_column(x1) + 1, 0)]:
+            for cell in row:
+                near_particles += cell
+
+        return near_particles
+
+
+class HashGrid(Grid):
+    # Sparse version of the grid for open scenes: the cells (same size as in Grid) continue beyond the edges
+    # of the world and only the occupied ones are stored, keyed by (row, column)
+    bounded = False
+
+    def init_grid(self):
+        self.grid = {}
+        for particle in self.sim.particles:
+            key = (int(particle.y // self.row_height), int(particle.x // self.column_width))
+            cell = self.grid.get(key)
+            if cell is None:
+                self.grid[key] = [particle]
+            else:
+                cell.append(particle)
+
+    def return_row(self, y):
+        return int(y // self.row_height)
+
+    def return_column(self, x):
+        return int(x // self.column_width)
+
+    def return_particles(self, particle):
+        if particle.return_none:
+            return []
+        if particle.return_all:
+            return self.sim.particles
+        if particle.attr == 0 and particle.repel == 0 and not particle.collision_bool:
+            return []
+        if particle.attr_r < 0 and particle.attr != 0:
+            return self.sim.particles
+
+        return self.return_near_particles(particle, particle.range_)
+
+    def return_near_particles(self, particle, radius):
+        return self.return_particles_in(particle.x - radius, particle.y - radius,
+                                        particle.x + radius, particle.y + radius)
+
+    def return_particles_in(self, x0, y0, x1, y1):
+        min_row, max_row = self.return_row(y0), self.return_row(y1)
+        min_col, max_col = self.return_column(x0), self.return_column(x1)
+
+        near_particles = []
+        if (max_row - min_row + 1) * (max_col - min_col + 1) > len(self.grid):
+            # Large areas: cheaper to go through the occupied cells
+            for (row, column), cell in self.grid.items():
+                if min_row <= row <= max_row and min_col <= column <= max_col:
+                    near_particles += cell
+        else:
+            for i in range(min_row, max_row + 1):
+                for j in range(min_col, max_col + 1):
+                    cell = self.grid.get((i, j))
+                    if cell is not None:
+                        near_particles += cell
+
+        return near_particles
@@ -10,15 +10,16 @@ class GUI:
         self.tk.title(title)
         self.tk.resizable(0, 0)
         self.tk.protocol("WM_DELETE_WINDOW", self.destroy)
-        self.gui_canvas = Canvas(self.tk, width=self.sim.width + 200, height=self.sim.height + 30)
+        self.gui_canvas = Canvas(self.tk, width=self.sim.canvas_width + 200, height=self.sim.canvas_height + 30)
         self.gui_canvas.pack()
-        self.canvas = Canvas(self.tk, width=self.sim.width, height=self.sim.height)
+        self.canvas = Canvas(self.tk, width=self.sim.canvas_width, height=self.sim.canvas_height)
         self.canvas.place(x=0, y=30)
 
         self.code_window = None
         self.extra_window = None
+        self.plot_window = None
 
-        self.toolbar = self.gui_canvas.create_rectangle(0, 0, self.sim.width, 30, fill="#1f3333")
+        self.toolbar = self.gui_canvas.create_rectangle(0, 0, self.sim.canvas_width, 30, fill="#1f3333")
         self.gui_canvas.create_line(80, 0, 80, 30, fill='grey30')
 
         self.play_photo = PhotoImage(file=os.path.join(self.path, 'Assets/play.gif'), master=self.tk).subsample(8, 8)
@@ -52,70 +53,78 @@ class GUI:
 
         self.link_btn = Button(self.tk, text="LINK", font=('Helvetica', 8, 'bold'), cursor='hand2', fg="khaki1",
                                bg='#1f3333', activebackground='#1f3333', relief='flat',
-                               command=lambda: self.sim.link_selection())
+                               command=lambda: self.sim.run_action('link_selection'))
         self.link_btn.place(x=250, y=16, anchor='center')
 
         self.unlink_btn = Button(self.tk, text="UNLINK", font=('Helvetica', 8, 'bold'), cursor='hand2',
                                  fg="blue violet", bg='#1f3333', activebackground='#1f3333', relief='flat',
-                                 command=lambda: self.sim.unlink_selection())
+                                 command=lambda: self.sim.run_action('unlink_selection'))
         self.unlink_btn.place(x=300, y=16, anchor='center')
 
         self.save_img = PhotoImage(file=os.path.join(self.path, 'Assets/save.gif'), master=self.tk).subsample(28, 28)
         self.save_btn = Button(self.tk, image=self.save_img, cursor='hand2',
                                bg='#1f3333', activebackground='#1f3333', relief='flat',
                                command=lambda: self.sim.save_manager.save())
-        self.save_btn.place(x=self.sim.width - 110, y=16, anchor='center')
+        self.save_btn.place(x=self.sim.canvas_width - 110, y=16, anchor='center')
 
         self.load_img = PhotoImage(file=os.path.join(self.path, 'Assets/load.gif'), master=self.tk).subsample(32, 32)
         self.load_btn = Button(self.tk, image=self.load_img, cursor='hand2',
                                bg='#1f3333', activebackground='#1f3333', relief='flat',
                                command=lambda: self.sim.save_manager.load())
-        self.load_btn.place(x=self.sim.width - 75, y=16, anchor='center')
+        self.load_btn.place(x=self.sim.canvas_width - 75, y=16, anchor='center')
 
         self.code_img = PhotoImage(file=os.path.join(self.path, 'Assets/code.gif'), master=self.tk).subsample(13, 13)
         self.code_btn = Button(self.tk, image=self.code_img, cursor='hand2', relief=FLAT,
                                bg='#1f3333', activebackground='#1f3333',
                                command=lambda: CodeWindow(self.sim))
-        self.code_btn.place(x=self.sim.width - 25, y=16, anchor='center')
+        self.code_btn.place(x=self.sim.canvas_width - 25, y=16, anchor='center')
 
         # layout sidebar-GUI
         self.tabControl = ttk.Notebook(self.tk)
         self.tab1 = ttk.Frame(self.tabControl, relief='flat')
         self.tabControl.add(self.tab1, text='Sim-Settings')
-        self.tab2 = ttk.Frame(self.tabControl, relief='flat', width=200, height=self.sim.height + 30)
+        self.tab2 = ttk.Frame(self.tabControl, relief='flat', width=200, height=self.sim.canvas_height + 30)
         self.tabControl.add(self.tab2, text='Particle-Settings')
-        self.tabControl.place(x=self.sim.width, y=0)
+        self.tabControl.place(x=self.sim.canvas_width, y=0)
 
         # layout self.tab1
-        self.tab1_canvas = Canvas(self.tab1, width=200, height=self.sim.height)
+        self.tab1_canvas = Canvas(self.tab1, width=200, height=self.sim.canvas_height)
         self.tab1_canvas.pack()
 
         Label(self.tab1, text='Gravity:', font=('helvetica', 8)).place(x=7, y=20, anchor='nw')
-        self.gravity_entry = Spinbox(self.tab1, width=7, from_=0, to=1, increment=0.1)
+        self.gravity_var = StringVar(self.tk)
+        self.gravity_entry = Spinbox(self.tab1, width=7, from_=0, to=1, increment=0.1, textvariable=self.gravity_var)
         self.gravity_entry.delete(0, END)
         self.gravity_entry.insert(0, self.sim.g)
         self.gravity_entry.place(x=100, y=20)
 
         Label(self.tab1, text='Air Resistance:', font=('helvetica', 8)).place(x=7, y=50, anchor='nw')
-        self.air_res_entry = Spinbox(self.tab1, width=7, from_=0, to=1, increment=0.01)
+        self.air_res_var = StringVar(self.tk)
+        self.air_res_entry = Spinbox(self.tab1, width=7, from_=0, to=1, increment=0.01, textvariable=self.air_res_var)
         self.air_res_entry.delete(0, END)
         self.air_res_entry.insert(0, self.sim.air_res)
         self.air_res_entry.place(x=100, y=50)
 
         Label(self.tab1, text='Ground Friction:', font=('helvetica', 8)).place(x=7, y=80, anchor='nw')
-        self.friction_entry = Spinbox(self.tab1, width=7, from_=0, to=1, increment=0.01)
+        self.friction_var = StringVar(self.tk)
+        self.friction_entry = Spinbox(self.tab1, width=7, from_=0, to=1, increment=0.01,
+                                      textvariable=self.friction_var)
         self.friction_entry.delete(0, END)
         self.friction_entry.insert(0, self.sim.ground_friction)
         self.friction_entry.place(x=100, y=80)
 
+        self.temp_var = DoubleVar(self.tk)
         self.temp_sc = Scale(self.tab1, from_=0, to=5, orient=HORIZONTAL, resolution=0.1, length=175, width=10,
-                             tickinterval=1, fg='gray65', activebackground='midnight blue', cursor='hand2')
+                             tickinterval=1, fg='gray65', activebackground='midnight blue', cursor='hand2',
+                             variable=self.temp_var)
         self.temp_sc.set(self.sim.temperature)
         self.temp_sc.place(x=100, y=153, anchor='center')
         Label(self.tab1, text='Temperature:', font=('helvetica', 8)).place(x=7, y=110, anchor='nw')
 
+        self.speed_var = DoubleVar(self.tk)
         self.speed_sc = Scale(self.tab1, from_=0, to=3, orient=HORIZONTAL, resolution=0.01, length=175, width=10,
-                              tickinterval=1, fg='gray65', activebackground='midnight blue', cursor='hand2')
+                              tickinterval=1, fg='gray65', activebackground='midnight blue', cursor='hand2',
+                              variable=self.speed_var)
         self.speed_sc.set(1)
         self.speed_sc.place(x=100, y=233, anchor='center')
         Label(self.tab1, text='Simulation Speed:', font=('helvetica', 8)).place(x=7, y=190, anchor='nw')
@@ -178,7 +187,8 @@ class GUI:
         self.tab1_canvas.create_line(10, 525, 190, 525, fill='grey50')
 
         Label(self.tab1, text='Min Spawn-Delay:', font=('helvetica', 8)).place(x=7, y=533, anchor='nw')
-        self.delay_entry = Spinbox(self.tab1, width=7, from_=0, to=1, increment=0.01)
+        self.delay_var = StringVar(self.tk)
+        self.delay_entry = Spinbox(self.tab1, width=7, from_=0, to=1, increment=0.01, textvariable=self.delay_var)
         self.delay_entry.delete(0, END)
         self.delay_entry.insert(0, self.sim.min_spawn_delay)
         self.delay_entry.place(x=100, y=533)
@@ -196,7 +206,7 @@ class GUI:
         self.extra_btn.place(x=7, y=580)
 
         # layout tab2
-        self.tab2_canvas = Canvas(self.tab2, width=200, height=self.sim.height)
+        self.tab2_canvas = Canvas(self.tab2, width=200, height=self.sim.canvas_height)
         self.tab2_canvas.pack()
 
         Label(self.tab2, text='Radius:', font=('helvetica', 8)).place(x=7, y=20, anchor='nw')
@@ -304,13 +314,14 @@ class GUI:
         self.group_add_btn = Button(self.tab2, text="+", font=('Helvetica', 15, 'bold'), cursor='hand2',
                                     fg="grey14",
                                     bg='#F0F0F0', activebackground='#F0F0F0', relief='flat', width=1,
-                                    command=self.sim.add_group)
+                                    command=lambda: self.sim.run_action('add_group'))
         self.group_add_btn.place(x=105, y=480, anchor='center')
 
         self.select_img2 = PhotoImage(file=os.path.join(self.path, 'Assets/select2.gif'), master=self.tk).subsample(54, 54)
         self.group_select_btn = Button(self.tab2, image=self.select_img2, cursor='hand2', bg='#F0F0F0',
                                        activebackground='#F0F0F0', relief='flat',
-                                       command=self.sim.select_group)
+                                       command=lambda: self.sim.run_action('select_group',
+                                                                           self.groups_entry.get()))
         self.group_select_btn.place(x=123, y=480, anchor='center')
 
         self.separate_group_bool = BooleanVar(self.tk, False)
@@ -320,11 +331,13 @@ class GUI:
 
         self.copy_selected_btn = Button(self.tab2, text='Copy from selected', bg='light coral',
                                         command=self.sim.copy_from_selected)
-        self.copy_selected_btn.place(x=15, y=self.sim.height - 65)
-        self.set_selected_btn = Button(self.tab2, text='Set Selected', bg='light green', command=self.sim.set_selected)
-        self.set_selected_btn.place(x=15, y=self.sim.height - 30)
-        self.set_all_btn = Button(self.tab2, text='Set All', bg='light blue', command=self.sim.set_all)
-        self.set_all_btn.place(x=95, y=self.sim.height - 30)
+        self.copy_selected_btn.place(x=15, y=self.sim.canvas_height - 65)
+        self.set_selected_btn = Button(self.tab2, text='Set Selected', bg='light green',
+                                       command=lambda: self.sim.run_action('set_selected', self.sim.return_inputs()))
+        self.set_selected_btn.place(x=15, y=self.sim.canvas_height - 30)
+        self.set_all_btn = Button(self.tab2, text='Set All', bg='light blue',
+                                  command=lambda: self.sim.run_action('set_all', self.sim.return_inputs()))
+        self.set_all_btn.place(x=95, y=self.sim.canvas_height - 30)
 
     def ask_color_entry(self, *event):
         color = colorchooser.askcolor(title="Choose color")
@@ -346,6 +359,8 @@ class GUI:
             self.code_window.tk.update()
         if self.extra_window is not None:
             self.extra_window.update()
+        if self.plot_window is not None:
+            self.plot_window.update()
 
         self.tk.update()
 
@@ -365,7 +380,7 @@ class ExtraWindow:
         self.tk.resizable(0, 0)
         self.tk.protocol("WM_DELETE_WINDOW", self.destroy)
 
-        self.gui_canvas = Canvas(self.tk, width=300, height=300)
+        self.gui_canvas = Canvas(self.tk, width=300, height=420)
         self.gui_canvas.pack()
 
         Label(self.tk, text="Extra Options:", font=('Helvetica', 9, 'bold')).place(x=20, y=10)
@@ -403,11 +418,17 @@ class ExtraWindow:
         self.void_edges_chk.place(x=25, y=135)
         self.void_edges_bool.trace("w", self.void_edges_toggle)
 
+        self.sleeping_bool = BooleanVar(self.tk, self.sim.allow_sleeping)
+        self.sleeping_chk = Checkbutton(self.tk, text='Allow Sleeping', font=('helvetica', 8),
+                                        var=self.sleeping_bool)
+        self.sleeping_chk.place(x=150, y=135)
+        self.sleeping_bool.trace("w", self.sleeping_toggle)
+
         self.gui_canvas.create_text(75, 170, text='Links', font=('helvetica', 9), anchor='center')
         self.gui_canvas.create_line(50, 180, 100, 180, fill='grey50')
 
         self.fit_link_btn = Button(self.tk, text='Fit-link Selected', font=('helvetica', 7, 'bold'), bg='light blue',
-                                   command=lambda: self.sim.link_selection(fit_link=True))
+                                   command=lambda: self.sim.run_action('link_selection', True))
         self.fit_link_btn.place(x=30, y=195)
 
         self.stress_visualization_bool = BooleanVar(self.tk, self.sim.stress_visualization)
@@ -442,10 +463,43 @@ class ExtraWindow:
         self.link_shorter_button.bind('<ButtonRelease-1>', lambda x: self.toggle_link_change_minus(False))
         self.link_shorter_button.place(x=125, y=275, anchor='center')
 
+        self.gui_canvas.create_text(75, 305, text='Optimization', font=('helvetica', 9), anchor='center')
+        self.gui_canvas.create_line(40, 315, 110, 315, fill='grey50')
+
+        Label(self.tk, text='Far-field interval:', font=('helvetica', 8)).place(x=25, y=325, anchor='nw')
+        self.far_field_interval = IntVar(self.tk, value=self.sim.far_field_interval)
+        self.far_field_interval_entry = Spinbox(self.tk, width=7, from_=1, to=100, increment=1,
+                                                textvariable=self.far_field_interval)
+        self.far_field_interval_entry.place(x=130, y=325)
+        self.far_field_interval.trace("w", self.update_far_field)
+
+        Label(self.tk, text='Near-field radius:', font=('helvetica', 8)).place(x=25, y=350, anchor='nw')
+        self.near_field_radius = DoubleVar(self.tk, value=self.sim.near_field_radius)
+        self.near_field_radius_entry = Spinbox(self.tk, width=7, from_=0, to=1000, increment=5,
+                                               textvariable=self.near_field_radius)
+        self.near_field_radius_entry.place(x=130, y=350)
+        self.near_field_radius.trace("w", self.update_far_field)
+
+        self.adaptive_timestep_bool = BooleanVar(self.tk, self.sim.adaptive_timestep)
+        self.adaptive_timestep_chk = Checkbutton(self.tk, text='Adaptive Substeps', font=('helvetica', 8),
+                                                 var=self.adaptive_timestep_bool)
+        self.adaptive_timestep_chk.place(x=25, y=372)
+        self.adaptive_timestep_bool.trace("w", self.adaptive_timestep_toggle)
+
+        self.observables_btn = Button(self.tk, text='Observables', font=('helvetica', 7, 'bold'), bg='light blue',
+                                      command=lambda: PlotWindow(self.sim))
+        self.observables_btn.place(x=180, y=372)
+
+        self.sparse_grid_bool = BooleanVar(self.tk, self.sim.sparse_grid)
+        self.sparse_grid_chk = Checkbutton(self.tk, text='Sparse Grid (open edges)', font=('helvetica', 8),
+                                           var=self.sparse_grid_bool)
+        self.sparse_grid_chk.place(x=25, y=394)
+        self.sparse_grid_bool.trace("w", self.sparse_grid_toggle)
+
     def update_gravity(self, *event):
         try:
             rads = np.radians(self.gravity_dir.get())
-            self.sim.g_dir = np.array(np.array([math.sin(rads), math.cos(rads)]))
+            self.sim.run_action('set_value', 'g_dir', np.array([math.sin(rads), math.cos(rads)]))
             self.gui_canvas.delete(self.g_dir_line)
             self.g_dir_line = self.gui_canvas.create_line(200, 40, *(self.sim.g_dir * 15 + np.array([200, 40])))
         except:
@@ -454,12 +508,26 @@ class ExtraWindow:
     def update_wind(self, *event):
         try:
             rads = np.radians(self.wind_dir.get())
-            self.sim.wind_force = np.array(np.array([math.sin(rads), math.cos(rads)])) * self.wind_strength.get() / 10
+            self.sim.run_action('set_value', 'wind_force',
+                                np.array([math.sin(rads), math.cos(rads)]) * self.wind_strength.get() / 10)
             self.gui_canvas.delete(self.wind_line)
             self.wind_line = self.gui_canvas.create_line(200, 75, *(self.sim.wind_force * 100 + np.array([200, 75])))
         except:
             pass
 
+    def update_far_field(self, *event):
+        try:
+            self.sim.run_action('set_value', 'far_field_interval', max(self.far_field_interval.get(), 1))
+            self.sim.run_action('set_value', 'near_field_radius', self.near_field_radius.get())
+        except:
+            pass
+
+    def sparse_grid_toggle(self, *event):
+        self.sim.run_action('set_sparse_grid', self.sparse_grid_bool.get())
+
+    def adaptive_timestep_toggle(self, *event):
+        self.sim.run_action('set_value', 'adaptive_timestep', self.adaptive_timestep_bool.get())
+
     def update_stress(self, *event):
         self.sim.stress_visualization = self.stress_visualization_bool.get()
 
@@ -470,12 +538,14 @@ class ExtraWindow:
             self.gui_canvas.itemconfig(self.bg_color_rect, fill=color[1])
 
     def void_edges_toggle(self, *event):
-        self.sim.void_edges = self.void_edges_bool.get()
+        self.sim.run_action('set_value', 'void_edges', self.void_edges_bool.get())
+
+    def sleeping_toggle(self, *event):
+        self.sim.run_action('set_value', 'allow_sleeping', self.sleeping_bool.get())
 
     def change_length(self, sign):
         try:
-            self.sim.change_link_lengths(self.sim.selection,
-                                         float(self.delta_length_entry.get()) * sign)
+            self.sim.run_action('change_selection_link_lengths', float(self.delta_length_entry.get()) * sign)
         except Exception as e:
             self.sim.error = ['Input-Error', e]
 
@@ -540,12 +610,75 @@ class CodeWindow:
         code = self.code_box.get("1.0", END)
         self.sim.code = code
         if self.use_threading.get():
-            threading.Thread(target=self.sim.execute, args=[code]).start()
+            threading.Thread(target=self.sim.run_action, args=['execute', code]).start()
         else:
-            self.sim.execute(code)
+            self.sim.run_action('execute', code)
 
     def destroy(self):
         self.sim.gui.code_window = None
         self.sim.code = self.code_box.get("1.0", END)
         self.tk.destroy()
         del self
+
+
+class PlotWindow:
+    def __init__(self, sim):
+        self.sim = sim
+        self.sim.gui.plot_window = self
+        self.was_enabled = self.sim.observables.enabled
+        self.sim.observables.enabled = True
+        self.tk = Tk()
+        self.tk.title('Observables')
+        self.tk.geometry('420x300')
+        self.tk.resizable(0, 0)
+        self.tk.protocol("WM_DELETE_WINDOW", self.destroy)
+
+        self.width = 400
+        self.height = 240
+        self.drawn_count = None
+
+        Label(self.tk, text='Observable:', font=('helvetica', 8)).place(x=10, y=12)
+        self.name_entry = ttk.Combobox(self.tk, width=30, state='readonly')
+        self.name_entry.place(x=80, y=10)
+
+        self.canvas = Canvas(self.tk, width=self.width, height=self.height, bg='white')
+        self.canvas.place(x=10, y=45)
+
+    def update(self):
+        observables = self.sim.observables
+        names = sorted(observables.columns)
+        if list(self.name_entry['values']) != names:
+            self.name_entry['values'] = names
+            if self.name_entry.get() == '' and names:
+                self.name_entry.current(names.index('kinetic_energy') if 'kinetic_energy' in names else 0)
+
+        name = self.name_entry.get()
+        # Only redrawn when there are new samples or another observable got selected
+        if name in observables.columns and (observables.steps[observables.index - 1], name) != self.drawn_count:
+            self.drawn_count = (observables.steps[observables.index - 1], name)
+            self.draw(*observables.return_series(name))
+
+        self.tk.update()
+
+    def draw(self, steps, values):
+        self.canvas.delete('all')
+        finite = np.isfinite(values)
+        steps, values = steps[finite], values[finite]
+        if len(values) < 2:
+            return
+
+        low, high = values.min(), values.max()
+        span = high - low if high > low else 1
+        x = (steps - steps[0]) / max(steps[-1] - steps[0], 1) * (self.width - 20) + 10
+        y = self.height - 20 - (values - low) / span * (self.height - 40)
+        self.canvas.create_line(*np.column_stack([x, y]).ravel().tolist(), fill='royal blue')
+        self.canvas.create_text(5, 5, text=f'{high:.4g}', anchor='nw', font=('helvetica', 8))
+        self.canvas.create_text(5, self.height - 5, text=f'{low:.4g}', anchor='sw', font=('helvetica', 8))
+        self.canvas.create_text(self.width - 5, 5, text=f'{values[-1]:.4g} (step {steps[-1]})', anchor='ne',
+                                font=('helvetica', 8))
+
+    def destroy(self):
+        self.sim.gui.plot_window = None
+        self.sim.observables.enabled = self.was_enabled
+        self.tk.destroy()
+        del self
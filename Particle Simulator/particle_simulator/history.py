@@ -0,0 +1,144 @@
+from particle_simulator import *
+
+
+def return_state(particle):
+    state = particle.__dict__.copy()
+    state['v'] = particle.v.copy()
+    state['a'] = particle.a.copy()
+    state['far_a'] = particle.far_a.copy()
+    state['linked'] = particle.linked.copy()
+    state['link_lengths'] = particle.link_lengths.copy()
+    state['collisions'] = []
+    state['forces'] = []
+    if isinstance(particle.color, list):
+        state['color'] = particle.color.copy()
+
+    return state
+
+
+class Snapshot:
+    def __init__(self, sim):
+        self.sim = sim
+        # The particle list only holds references and gives the order of the particles that come back,
+        # only the particles an edit changes get their state copied
+        self.particles = sim.particles.copy()
+        self.selection = sim.selection.copy()
+        self.states = {}
+        # Particles the edit added and removed, the ones the simulation adds or removes itself (emitters, sinks, ...)
+        # stay as they are
+        self.added = []
+        self.removed = []
+        self.size = 8 * len(self.particles)  # rough estimate in bytes
+
+    def touch(self, particles, neighbours=True):
+        for p in particles:
+            for particle in [p] + p.linked if neighbours else [p]:
+                if particle not in self.states:
+                    self.states[particle] = return_state(particle)
+                    self.size += 1000 + 100 * len(particle.linked)
+
+    def restore(self):
+        current = set(self.sim.particles)
+        edit_added = set(self.added)
+        removed = [p for p in dict.fromkeys(self.added) if p in current]
+        added = [p for p in dict.fromkeys(self.removed) if p not in current and p not in edit_added]
+
+        # The current state of everything this snapshot would change, to be able to go back again
+        inverse = Snapshot(self.sim)
+        inverse.touch(self.states, neighbours=False)
+        inverse.touch(removed, neighbours=False)
+        inverse.added = added
+        inverse.removed = removed
+
+        # Pooled particles the restore brings back or removes have to leave or rejoin their emitter's pool
+        for p in removed:
+            if p.pool is not None and p not in p.pool:
+                p.pool.append(p)
+        for p in added:
+            if p.pool is not None and p in p.pool:
+                p.pool.remove(p)
+
+        for p, state in self.states.items():
+            vars(p).update(state)
+            p.mouse = False
+
+        # Particles that come back get their old place in the list, between the ones that stayed
+        order = {p: i for i, p in enumerate(self.particles)}
+        added.sort(key=lambda p: order.get(p, len(order)))
+        removed_set = set(removed)
+        particles = []
+        k = 0
+        for p in self.sim.particles:
+            if p in removed_set:
+                continue
+            while k < len(added) and order.get(added[k], len(order)) < order.get(p, len(order)):
+                particles.append(added[k])
+                k += 1
+            particles.append(p)
+        particles.extend(added[k:])
+
+        self.sim.particles = particles
+        self.sim.structure_changes += 1
+        present = set(particles)
+        self.sim.selection = [p for p in self.selection if p in present]
+        self.sim.groups = {name: [] for name in self.sim.groups}
+        for p in self.sim.particles:
+            try:
+                self.sim.groups[p.group].append(p)
+            except KeyError:
+                self.sim.groups[p.group] = [p]
+        for p in self.states:
+            self.sim.wake_island(p)
+
+        return inverse
+
+
+class History:
+    def __init__(self, sim, max_memory=64 * 2 ** 20):
+        self.sim = sim
+        self.max_memory = max_memory  # bytes, the oldest entries get dropped first
+        self.undo_stack = []
+        self.redo_stack = []
+
+    def begin(self, particles=(), neighbours=True):
+        # Has to be called before an edit, with every particle whose state or links the edit will change.
+        # Particles the edit adds are found by comparing the particle lists.
+        snapshot = Snapshot(self.sim)
+        snapshot.touch(particles, neighbours)
+        self.undo_stack.append(snapshot)
+        self.redo_stack = []
+        self.trim()
+
+    def touch(self, particles, neighbours=True):
+        # Adds particles to the edit started with the last begin(), eg. during a brush-stroke
+        if self.undo_stack:
+            self.undo_stack[-1].touch(particles, neighbours)
+            self.trim()
+
+    def inserted(self, particles):
+        # Called by the simulation, only particles added or removed outside of its steps belong to an edit
+        if self.undo_stack and not self.sim.stepping:
+            self.undo_stack[-1].added.extend(particles)
+
+    def deleted(self, particles):
+        if self.undo_stack and not self.sim.stepping:
+            self.undo_stack[-1].removed.extend(particles)
+
+    def trim(self):
+        while len(self.undo_stack) > 1 and self.return_size() > self.max_memory:
+            self.undo_stack.pop(0)
+
+    def return_size(self):
+        return sum(snapshot.size for snapshot in self.undo_stack + self.redo_stack)
+
+    def undo(self):
+        if self.undo_stack:
+            self.redo_stack.append(self.undo_stack.pop().restore())
+
+    def redo(self):
+        if self.redo_stack:
+            self.undo_stack.append(self.redo_stack.pop().restore())
+
+    def clear(self):
+        self.undo_stack = []
+        self.redo_stack = []
@@ -0,0 +1,14 @@
+import importlib
+
+
+class LazyModule:
+    # Stands in for a module and only imports it on the first attribute-access, eg. cv2 = LazyModule('cv2')
+    def __init__(self, name, *submodules):
+        self.__dict__['_LazyModule__names'] = (name,) + submodules
+
+    def __getattr__(self, key):
+        for name in reversed(self.__names):
+            module = importlib.import_module(name)
+        # Afterwards the attributes are found directly, without going through __getattr__ again
+        self.__dict__.update(vars(module))
+        return getattr(module, key)
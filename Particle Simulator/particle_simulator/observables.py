@@ -0,0 +1,186 @@
+from particle_simulator import *
+import csv
+
+
+def energy_and_momentum(sim, state):
+    masses, velocities = state['masses'], state['velocities']
+    momentum = (masses[:, None] * velocities).sum(axis=0)
+    return {'kinetic_energy': float(0.5 * (np.abs(masses) * np.einsum('ij,ij->i', velocities, velocities)).sum()),
+            'momentum_x': float(momentum[0]), 'momentum_y': float(momentum[1])}
+
+
+def group_centroids(sim, state):
+    names, groups = state['group_names'], state['group_indices']
+    counts = np.bincount(groups, minlength=len(names))
+    x = np.bincount(groups, state['positions'][:, 0], len(names)) / counts
+    y = np.bincount(groups, state['positions'][:, 1], len(names)) / counts
+    values = {}
+    for name, cx, cy in zip(names.tolist(), x.tolist(), y.tolist()):
+        values[f'{name}_x'] = cx
+        values[f'{name}_y'] = cy
+    return values
+
+
+def grid_density(sim, state):
+    # Particle count per grid-cell, the whole histogram is kept in Observables.density
+    positions = state['positions']
+    density, _, _ = np.histogram2d(positions[:, 1], positions[:, 0], bins=[sim.grid.rows, sim.grid.columns],
+                                   range=[[0, sim.height], [0, sim.width]])
+    state['density'] = density
+    return {'max_density': float(density.max()), 'occupied_cells': int(np.count_nonzero(density))}
+
+
+def link_stress(sim, state):
+    # Relative stretch of the fit-links, each link counted once
+    pairs, lengths = state['links'], state['link_lengths']
+    if len(pairs) == 0:
+        return {'links': 0, 'link_strain_mean': 0.0, 'link_strain_max': 0.0, 'broken_links': sim.broken_links}
+
+    distances = np.linalg.norm(state['positions'][pairs[:, 0]] - state['positions'][pairs[:, 1]], axis=1)
+    strain = np.abs(distances - lengths) / lengths
+    return {'links': len(pairs), 'link_strain_mean': float(strain.mean()), 'link_strain_max': float(strain.max()),
+            'broken_links': sim.broken_links}
+
+
+class Observables:
+    def __init__(self, sim, capacity=2000, interval=1):
+        self.sim = sim
+        self.enabled = False
+        self.capacity = capacity  # samples kept in the ring buffer
+        self.interval = interval  # steps between two samples
+        self.metrics = {'energy_and_momentum': energy_and_momentum,
+                        'group_centroids': group_centroids,
+                        'grid_density': grid_density,
+                        'link_stress': link_stress}
+
+        self.steps = np.zeros(capacity, dtype=int)
+        self.columns = {}
+        self.index = 0
+        self.count = 0
+        self.density = None
+        # Index-arrays of the particles and links, only rebuilt when the simulation reports a change
+        self.structure_key = None
+        self.groups = None
+        self.group_names = None
+        self.group_indices = None
+        self.links = None
+        self.link_lengths = None
+
+        self.output = None
+        self.output_interval = 100
+        self.output_columns = None
+        self.unwritten = 0
+
+    def add_metric(self, name, function):
+        # function(sim, state) -> {column: value}, state holds the particle-arrays ('positions', 'velocities', ...)
+        self.metrics[name] = function
+
+    def update(self):
+        if self.sim.step_count % self.interval != 0 or len(self.sim.particles) == 0:
+            return
+
+        particles = self.sim.particles
+        if self.sim.integrated == particles:
+            # Nothing moved the particles since they were integrated, their state is still in its buffer
+            columns = self.sim.return_buffer('state', len(particles), 12)
+            positions, velocities, masses = columns[:, 0:2], columns[:, 2:4], columns[:, 6]
+        else:
+            columns = self.sim.return_buffer('observables', len(particles), 5)
+            columns[:] = [(p.x, p.y, *p.v.tolist(), p.m) for p in particles]
+            positions, velocities, masses = columns[:, 0:2], columns[:, 2:4], columns[:, 4]
+        self.update_structure()
+        state = {'positions': positions, 'velocities': velocities, 'masses': masses, 'groups': self.groups,
+                 'group_names': self.group_names, 'group_indices': self.group_indices, 'links': self.links,
+                 'link_lengths': self.link_lengths}
+
+        values = {}
+        for function in self.metrics.values():
+            values.update(function(self.sim, state))
+        self.density = state.get('density', self.density)
+
+        for name, value in values.items():
+            if name not in self.columns:
+                self.columns[name] = np.full(self.capacity, np.nan)
+            self.columns[name][self.index] = value
+        for name in self.columns.keys() - values.keys():
+            self.columns[name][self.index] = np.nan
+        self.steps[self.index] = self.sim.step_count
+        self.index = (self.index + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+        self.unwritten += 1
+        if self.output is not None and self.unwritten >= self.output_interval:
+            self.write()
+
+    def update_structure(self):
+        key = (self.sim.structure_changes, len(self.sim.particles))
+        if key == self.structure_key:
+            return
+        self.structure_key = key
+
+        particles = self.sim.particles
+        indices = {p: i for i, p in enumerate(particles)}
+        pairs, lengths = [], []
+        for i, p in enumerate(particles):
+            for link, length in p.link_lengths.items():
+                j = indices.get(link)
+                if length != 'repel' and j is not None and i < j and length > 0:
+                    pairs.append((i, j))
+                    lengths.append(length)
+        self.groups = np.array([p.group for p in particles])
+        self.group_names, self.group_indices = np.unique(self.groups, return_inverse=True)
+        self.links = np.array(pairs, dtype=int).reshape(-1, 2)
+        self.link_lengths = np.array(lengths, dtype='float64')
+
+    def return_order(self):
+        # Buffer-indices from the oldest to the newest sample
+        return (np.arange(self.count) + self.index - self.count) % self.capacity
+
+    def return_series(self, name):
+        order = self.return_order()
+        return self.steps[order], self.columns[name][order]
+
+    def clear(self):
+        self.columns = {}
+        self.index = 0
+        self.count = 0
+        self.unwritten = 0
+
+    def stream(self, filename, every=100):
+        # Writes the samples to a .csv (appended) or .npz (whole buffer) file every few samples
+        self.output = filename
+        self.output_interval = every
+        self.output_columns = None
+        self.unwritten = 0
+
+    def write(self, filename=None):
+        streaming = filename is None
+        filename = self.output if streaming else filename
+        order = self.return_order()
+
+        if filename.endswith('.npz'):
+            arrays = {name: self.columns[name][order] for name in self.columns}
+            if self.density is not None:
+                arrays['density'] = self.density
+            np.savez(filename, step=self.steps[order], **arrays)
+        else:
+            if streaming:
+                order = order[len(order) - min(self.unwritten, len(order)):]
+            # The columns of a streamed file are fixed by its first rows
+            header = not streaming or self.output_columns is None
+            if header:
+                columns = sorted(self.columns)
+                if streaming:
+                    self.output_columns = columns
+            else:
+                columns = self.output_columns
+            with open(filename, 'a' if streaming and not header else 'w', newline='') as file:
+                writer = csv.writer(file)
+                if header:
+                    writer.writerow(['step'] + columns)
+                for i in order:
+                    writer.writerow([self.steps[i]] + [self.columns[name][i] if name in self.columns else ''
+                                                       for name in columns])
+
+        if streaming:
+            self.unwritten = 0
@@ -1,24 +1,50 @@
 from particle_simulator import *
 
 
+# Particle-keyword -> attribute name, as stored in the particle dictionaries of .sim files
+ATTRIBUTE_NAMES = {'radius': 'r', 'color': 'color', 'mass': 'm', 'velocity': 'v', 'bounciness': 'bounciness',
+                   'locked': 'locked', 'collisions': 'collision_bool', 'attract_r': 'attr_r', 'repel_r': 'repel_r',
+                   'attraction_strength': 'attr', 'repulsion_strength': 'repel',
+                   'linked_group_particles': 'linked_group_particles',
+                   'link_attr_breaking_force': 'link_attr_breaking_force',
+                   'link_repel_breaking_force': 'link_repel_breaking_force', 'group': 'group',
+                   'separate_group': 'separate_group', 'gravity_mode': 'gravity_mode'}
+
+
+def settings_to_columns(settings, amount):
+    # Every setting is either one value for all particles or one value per particle
+    columns = {}
+    for key, value in settings.items():
+        vector = key in ('color', 'velocity')
+        if isinstance(value, str) or np.ndim(value) < (2 if vector else 1):
+            columns[key] = [value] * amount
+        else:
+            value = np.asarray(value).tolist()
+            if len(value) != amount:
+                raise ValueError(f"'{key}' has {len(value)} values for {amount} particles")
+            columns[key] = value
+
+    return columns
+
+
 class Particle:
     def __init__(self, sim, x, y, radius=4, color='random', mass=1,
                  velocity=np.zeros(2), bounciness=0.7, locked=False, collisions=False, attract_r=-1, repel_r=10,
                  attraction_strength=0.5, repulsion_strength=1, linked_group_particles=True,
                  link_attr_breaking_force=-1, link_repel_breaking_force=-1,
-                 group='group1', separate_group=False, gravity_mode=False):
+                 group='group1', separate_group=False, gravity_mode=False, insert=True):
         self.sim = sim
         self.x = x
         self.y = y
         self.r = radius
         if color == 'random':
-            self.color = np.random.randint(0, 255, 3).tolist()
+            self.color = sim.rng.integers(0, 255, 3).tolist()
         else:
             self.color = color
 
         self.m = mass
-        self.v = np.array(velocity).astype('float32')
-        self.a = np.zeros(2)
+        self.v = np.array(velocity, dtype=sim.precision)
+        self.a = np.zeros(2, dtype=sim.precision)
         self.bounciness = bounciness
         self.collision_bool = collisions
         self.locked = locked
@@ -42,19 +68,17 @@ class Particle:
         self.separate_group = separate_group
 
         self.group = group
-        try:
-            self.sim.groups[self.group].append(self)
-        except KeyError:
-            self.sim.groups[self.group] = [self]
-            self.sim.gui.group_indices.append(int(self.group.replace('group', '')))
-            self.sim.gui.groups_entry['values'] = [f'group{i}' for i in sorted(self.sim.gui.group_indices)]
-
         self.collisions = []
         self.forces = []
 
         self.mouse = False
+        self.asleep = False
+        self.still_frames = 0
+        self.pool = None
+        self.far_a = np.zeros(2, dtype=sim.precision)
 
-        self.sim.particles.append(self)
+        if insert:
+            self.sim.insert_particles([self])
 
     def init_constants(self):
         self.return_all = self.attr_r < 0 and self.attr != 0
@@ -87,32 +111,57 @@ class Particle:
         for p in self.linked:
             del p.link_lengths[self]
             p.linked.remove(self)
+            self.sim.wake_island(p)
         self.sim.groups[self.group].remove(self)
+        self.sim.history.deleted([self])
+        self.sim.structure_changes += 1
+        if self.pool is not None:
+            self.pool.append(self)
         del self
 
+    def respawn(self, x, y, velocity):
+        self.x = x
+        self.y = y
+        self.v[:] = velocity
+        self.a[:] = 0
+        self.linked.clear()
+        self.link_lengths.clear()
+        self.collisions.clear()
+        self.forces.clear()
+        self.mouse = False
+        self.asleep = False
+        self.still_frames = 0
+        self.far_a[:] = 0
+
     def select(self):
         if not self in self.sim.selection:
             self.sim.selection.append(self)
 
     def return_dict(self, index_source='all'):
-        if index_source == 'all':
+        if isinstance(index_source, str) and index_source == 'all':
             index_source = self.sim.particles
+        if not isinstance(index_source, dict):
+            index_source = {particle: i for i, particle in enumerate(index_source)}
 
         dictionary = self.__dict__.copy()
         del dictionary['sim']
         del dictionary['collisions']
         del dictionary['forces']
+        del dictionary['pool']
+        # The arrays get changed in place while simulating
+        for key in ['v', 'a', 'far_a']:
+            dictionary[key] = dictionary[key].copy()
 
-        dictionary['linked'] = [index_source.index(particle) for particle in dictionary['linked'] if
+        dictionary['linked'] = [index_source[particle] for particle in dictionary['linked'] if
                                 particle in index_source]
-        dictionary['link_lengths'] = {index_source.index(particle): value
+        dictionary['link_lengths'] = {index_source[particle]: value
                                       for particle, value in dictionary['link_lengths'].items() if
                                       particle in index_source}
 
         return dictionary
 
     def applyForce(self, force):
-        self.a = self.a + force / abs(self.m)
+        self.a += force / abs(self.m)
 
     def calc_attraction_force(self, distance, direction, repel_r, attr, repel, rest_distance,
                               is_in_group, is_linked, link_attr_breaking_force, link_repel_breaking_force,
@@ -139,20 +188,39 @@ class Particle:
                 self.sim.link_colors.append([self, part, min(percentage, 1)])
 
             if 0 <= max_force <= abs(magnitude):
-                self.sim.unlink([self, part])
+                self.sim.breaking_links.append((self, part))
 
         return direction * magnitude
 
     def update(self, grid):
-        if not self.sim.paused:
-            self.a = self.sim.g_vector * math.copysign(1, self.m)  # Gravity
-
-            self.applyForce(self.sim.wind_force * self.r)
+        if self.asleep:
+            if self.mouse or self.forces or not self.sim.allow_sleeping:
+                self.sim.wake_island(self)
+            else:
+                self.collisions = []
+                return False
 
+        if not self.sim.paused:
+            # Gravity and wind get added in Simulation.integrate()
+            self.a.fill(0)
             for force in self.forces:
                 self.applyForce(force)
 
-            if self.sim.use_grid:
+            # Multiple time-stepping: far-field forces only get recalculated every few steps
+            interval = self.sim.return_far_field_interval(self)
+            far_field = interval > 1
+            use_far_cache = far_field and self.sim.step_count % interval != 0
+            if use_far_cache:
+                self.a += self.far_a
+            elif far_field:
+                self.far_a.fill(0)
+
+            if use_far_cache and self.return_all:
+                near_particles = grid.return_near_particles(self, self.sim.near_field_radius) \
+                    if self.sim.use_grid else self.sim.particles
+                near_set = set(near_particles)
+                near_particles = near_particles + [p for p in self.linked if p not in near_set]
+            elif self.sim.use_grid:
                 near_particles = grid.return_particles(self)
             else:
                 near_particles = self.sim.particles
@@ -174,6 +242,13 @@ class Particle:
                     distance = np.linalg.norm(direction)
                     if distance != 0:
                         direction = direction / distance
+
+                    # Far pairs get calculated one-sided by both particles, on their own far-field steps
+                    is_far = far_field and self.sim.return_far_field_interval(p) > 1 and not is_linked and \
+                        distance >= max(self.sim.near_field_radius, self.r + p.r)
+                    if is_far and use_far_cache:
+                        continue
+
                     conditions = [
                         (p.attr != 0 or p.repel != 0) and (p.attr_r < 0 or p.attr_r < 0 or distance < p.attr_r),
                         (self.attr != 0 or self.repel != 0) and
@@ -184,7 +259,7 @@ class Particle:
                             if self.gravity_mode or p.gravity_mode:
                                 force = np.zeros(2)
                             else:
-                                force = np.random.uniform(-10, 10, 2)
+                                force = self.sim.rng.uniform(-10, 10, 2)
                                 force = force / np.linalg.norm(force) * -self.repel
                         else:
                             if self.sim.calculate_radii_diff:
@@ -218,10 +293,17 @@ class Particle:
                                                                    self.gravity_mode or p.gravity_mode, p)
 
                         self.applyForce(force)
-                        p.forces.append(-force)
+                        if is_far:
+                            self.far_a += force / abs(self.m)
+                            continue
+                        # Resting particles don't disturb sleeping neighbours
+                        if not p.asleep or self.still_frames == 0:
+                            p.forces.append(-force)
                         p.collisions.append(self)
 
                     if self.collision_bool and distance < self.r + p.r:
+                        if p.asleep:
+                            self.sim.wake_island(p)
                         temp = self.v[0]
                         self.v[0] = (self.m - p.m) / (self.m + p.m) * self.v[0] + 2 * p.m / (self.m + p.m) * p.v[0]
                         p.v[0] = 2 * self.m / (self.m + p.m) * temp + (p.m - self.m) / (self.m + p.m) * temp
@@ -238,41 +320,14 @@ class Particle:
                             p.x -= translate_vector[0] * (p.m / (self.m + p.m))
                             p.y -= translate_vector[1] * (p.m / (self.m + p.m))
 
-            if not self.mouse and not self.locked:
-                self.v += np.clip(self.a, -2, 2) * self.sim.speed
-                self.v += np.random.uniform(-1, 1, 2) * self.sim.temperature * self.sim.speed
-                self.v *= self.sim.air_res_calc
-                self.x += self.v[0] * self.sim.speed
-                self.y += self.v[1] * self.sim.speed
-
         if self.mouse:
-            self.x += self.sim.mx - self.sim.prev_mx
-            self.y += self.sim.my - self.sim.prev_my
+            # The mouse movement gets spread over the substeps of a frame
+            self.x += (self.sim.mx - self.sim.prev_mx) / self.sim.substeps
+            self.y += (self.sim.my - self.sim.prev_my) / self.sim.substeps
             if not self.sim.paused:
-                self.v = np.array([self.sim.mx - self.sim.prev_mx, self.sim.my - self.sim.prev_my], dtype='float64') / \
-                         self.sim.speed
-
-        if self.sim.right and self.x + self.r >= self.sim.width:
-            self.v[0] *= -self.bounciness
-            self.v[1] *= 1 - self.sim.ground_friction
-            self.x = self.sim.width - self.r
-        if self.sim.left and self.x - self.r <= 0:
-            self.v[0] *= -self.bounciness
-            self.v[1] *= 1 - self.sim.ground_friction
-            self.x = self.r
-        if self.sim.bottom and self.y + self.r >= self.sim.height:
-            self.v[1] *= -self.bounciness
-            self.v[0] *= 1 - self.sim.ground_friction
-            self.y = self.sim.height - self.r
-        if self.sim.top and self.y - self.r <= 0:
-            self.v[1] *= -self.bounciness
-            self.v[0] *= 1 - self.sim.ground_friction
-            self.y = self.r
-
-        if self.sim.void_edges and (self.x - self.r >= self.sim.width or self.x + self.r <= 0 or
-                self.y - self.r >= self.sim.height or self.y + self.r <= 0):
-            self.delete()
-            return
+                self.v = np.array([self.sim.mx - self.sim.prev_mx, self.sim.my - self.sim.prev_my],
+                                  dtype=self.sim.precision) / (self.sim.speed * self.sim.substeps)
 
         self.collisions = []
         self.forces = []
+        return True
@@ -0,0 +1,88 @@
+from particle_simulator import *
+
+
+class Recorder:
+    # Logs the input that changes a simulation (mouse, keys, toolbar-buttons, settings) with the frame it happened
+    # before, replay() runs the recording headless and as fast as possible, eg.
+    # log = recorder.Recorder(sim); ...; log.stop(); log.save('run.rec'); sim = recorder.replay('run.rec')
+    def __init__(self, sim, seed=None):
+        self.sim = sim
+        self.frame = 0
+        self.events = []  # (frame, seconds since the start, action, arguments)
+        self.input_state = None
+        self.start_time = time.time()
+
+        # The replay starts from this state, with the same seed
+        seed = np.random.SeedSequence().entropy if seed is None else seed
+        self.sim.set_seed(seed)
+        self.sim.history.clear()
+        indices = {p: i for i, p in enumerate(self.sim.particles)}
+        self.start = {'data': self.sim.save_manager.return_data(),
+                      'seed': seed,
+                      'size': (self.sim.width, self.sim.height),
+                      'step_count': self.sim.step_count,
+                      'paused': self.sim.paused,
+                      'selection': [indices[p] for p in self.sim.selection if p in indices],
+                      # Reaction-forces and pairs carried over into the next step, saves don't include them
+                      'forces': [[force.copy() for force in p.forces] for p in self.sim.particles],
+                      'collisions': [[indices[c] for c in p.collisions if c in indices] for p in self.sim.particles],
+                      # copy_selected() replaces the clipboard instead of changing it
+                      'clipboard': self.sim.clipboard}
+        self.sim.recorder = self
+
+    def update_input_state(self):
+        state = (self.sim.prev_mx, self.sim.prev_my, self.sim.mx, self.sim.my, self.sim.mr, self.sim.mouse_mode)
+        if state != self.input_state:
+            self.input_state = state
+            self.events.append((self.frame, time.time() - self.start_time, 'set_input_state', state))
+
+    def record(self, name, *args):
+        # The mouse-position is logged first, actions like paste() depend on it
+        self.update_input_state()
+        self.events.append((self.frame, time.time() - self.start_time, name, args))
+
+    def update(self):
+        # Called at the start of every step
+        self.update_input_state()
+        self.frame += 1
+
+    def stop(self):
+        self.sim.recorder = None
+
+    def return_recording(self):
+        return {'start': self.start, 'events': self.events.copy(), 'frames': self.frame}
+
+    def save(self, filename):
+        self.sim.save_manager.write(self.return_recording(), filename, compress=True)
+
+
+def replay(recording, frames=None, **kwargs):
+    # recording: filename or Recorder.return_recording(), returns the simulation after the recorded frames
+    if isinstance(recording, str):
+        recording = Simulation(headless=True).save_manager.read(recording)
+    start = recording['start']
+
+    width, height = start['size']
+    # Loading keeps the precision of the simulation, the replay has to start with the one of the recording
+    kwargs.setdefault('precision', start['data']['sim-settings'].get('precision', ['float64'])[0])
+    sim = Simulation(width=width, height=height, headless=True, **kwargs)
+    sim.save_manager.apply_data(start['data'])
+    sim.step_count = start['step_count']
+    sim.paused = start['paused']
+    sim.selection = [sim.particles[i] for i in start['selection']]
+    sim.clipboard = start['clipboard']
+    for p, forces, collisions in zip(sim.particles, start['forces'], start['collisions']):
+        p.forces = [force.copy() for force in forces]
+        p.collisions = [sim.particles[i] for i in collisions]
+    sim.set_seed(start['seed'])
+
+    events = recording['events']
+    index = 0
+    for frame in range(recording['frames'] if frames is None else frames):
+        while index < len(events) and events[index][0] <= frame:
+            _, _, name, args = events[index]
+            sim.run_action(name, *args)
+            index += 1
+        sim.step()
+
+    return sim
@@ -4,116 +4,228 @@ from particle_simulator import *
 class SaveManager:
     def __init__(self, sim):
         self.sim = sim
-        self.file_location = os.path.dirname(self.sim.gui.path)
+        self.file_location = os.getcwd() if self.sim.gui is None else os.path.dirname(self.sim.gui.path)
         self.filename = 'simulation'
 
+        self.autosave_interval = 0  # seconds between checkpoints, 0 turns autosaving off
+        self.checkpoint_location = os.path.join(self.file_location, 'checkpoints')
+        self.max_checkpoints = 5
+        self.last_autosave = time.time()
+        self.writer = None
+
+    def return_data(self):
+        sim_settings = {'g_dir': [self.sim.g_dir, 'var'],
+                        'wind_force': [self.sim.wind_force, 'var'],
+                        'stress_visualization': [self.sim.stress_visualization, 'var'],
+                        'bg_color': [self.sim.bg_color, 'var'],
+                        'void_edges': [self.sim.void_edges, 'var'],
+                        'allow_sleeping': [self.sim.allow_sleeping, 'var'],
+                        'far_field_interval': [self.sim.far_field_interval, 'var'],
+                        'group_far_field_intervals': [self.sim.group_far_field_intervals, 'var'],
+                        'near_field_radius': [self.sim.near_field_radius, 'var'],
+                        'adaptive_timestep': [self.sim.adaptive_timestep, 'var'],
+                        'sparse_grid': [self.sim.sparse_grid, 'var'],
+                        'precision': [self.sim.precision, 'var'],
+                        'code': [self.sim.code, 'var']}
+
+        if self.sim.gui is None:
+            # Without a window, the settings come from the simulation-attributes
+            sim_settings.update(self.sim.settings.return_values())
+            sim_settings['grid_res_x_value'] = [self.sim.grid.rows, 'set']
+            sim_settings['grid_res_y_value'] = [self.sim.grid.columns, 'set']
+            particle_settings = {}
+        else:
+            sim_settings.update({'gravity_entry': [self.sim.gui.gravity_entry.get(), 'entry'],
+                                 'air_res_entry': [self.sim.gui.air_res_entry.get(), 'entry'],
+                                 'friction_entry': [self.sim.gui.friction_entry.get(), 'entry'],
+                                 'temp_sc': [self.sim.gui.temp_sc.get(), 'set'],
+                                 'speed_sc': [self.sim.gui.speed_sc.get(), 'set'],
+                                 'show_fps': [self.sim.gui.show_fps.get(), 'set'],
+                                 'show_num': [self.sim.gui.show_num.get(), 'set'],
+                                 'show_links': [self.sim.gui.show_links.get(), 'set'],
+                                 'top_bool': [self.sim.gui.top_bool.get(), 'set'],
+                                 'bottom_bool': [self.sim.gui.bottom_bool.get(), 'set'],
+                                 'left_bool': [self.sim.gui.left_bool.get(), 'set'],
+                                 'right_bool': [self.sim.gui.right_bool.get(), 'set'],
+                                 'grid_bool': [self.sim.gui.grid_bool.get(), 'set'],
+                                 'grid_res_x_value': [self.sim.gui.grid_res_x_value.get(), 'set'],
+                                 'grid_res_y_value': [self.sim.gui.grid_res_y_value.get(), 'set'],
+                                 'delay_entry': [self.sim.gui.delay_entry.get(), 'entry'],
+                                 'calculate_radii_diff_bool': [self.sim.gui.calculate_radii_diff_bool.get(), 'set']})
+
+            particle_settings = {'radius_entry': [self.sim.gui.radius_entry.get(), 'entry'],
+                                 'color_entry': [self.sim.gui.color_entry.get(), 'entry'],
+                                 'mass_entry': [self.sim.gui.mass_entry.get(), 'entry'],
+                                 'velocity_x_entry': [self.sim.gui.velocity_x_entry.get(), 'entry'],
+                                 'velocity_y_entry': [self.sim.gui.velocity_y_entry.get(), 'entry'],
+                                 'bounciness_entry': [self.sim.gui.bounciness_entry.get(), 'entry'],
+                                 'do_collision_bool': [self.sim.gui.do_collision_bool.get(), 'set'],
+                                 'locked_bool': [self.sim.gui.locked_bool.get(), 'set'],
+                                 'linked_group_bool': [self.sim.gui.linked_group_bool.get(), 'set'],
+                                 'attr_r_entry': [self.sim.gui.attr_r_entry.get(), 'entry'],
+                                 'repel_r_entry': [self.sim.gui.repel_r_entry.get(), 'entry'],
+                                 'attr_strength_entry': [self.sim.gui.attr_strength_entry.get(), 'entry'],
+                                 'gravity_mode_bool': [self.sim.gui.gravity_mode_bool.get(), 'set'],
+                                 'repel_strength_entry': [self.sim.gui.repel_strength_entry.get(), 'entry'],
+                                 'link_attr_break_entry': [self.sim.gui.link_attr_break_entry.get(), 'entry'],
+                                 'link_repel_break_entry': [self.sim.gui.link_repel_break_entry.get(), 'entry'],
+                                 'groups_entry': [self.sim.gui.groups_entry.get(), 'entry'],
+                                 'separate_group_bool': [self.sim.gui.separate_group_bool.get(), 'set']}
+
+        indices = {particle: i for i, particle in enumerate(self.sim.particles)}
+        data = {'particles': [particle.return_dict(index_source=indices) for particle in self.sim.particles],
+                'colliders': [collider.return_dict() for collider in self.sim.colliders],
+                'emitters': [emitter.return_dict(index_source=indices) for emitter in self.sim.emitters],
+                'sinks': [sink.return_dict() for sink in self.sim.sinks],
+                'particle-settings': particle_settings,
+                'sim-settings': sim_settings}
+
+        return data
+
     def save(self):
-        filename = asksaveasfilename(initialdir=self.file_location,
-                                     initialfile=self.filename,
-                                     defaultextension=".sim",
-                                     filetypes=[("Simulation files", '*.sim'), ("All Files", "*.*")])
+        filename = filedialog.asksaveasfilename(initialdir=self.file_location,
+                                                initialfile=self.filename,
+                                                defaultextension=".sim",
+                                                filetypes=[("Simulation files", '*.sim'), ("All Files", "*.*")])
 
         if filename != '':
             try:
-                sim_settings = {'gravity_entry': [self.sim.gui.gravity_entry.get(), 'entry'],
-                                'air_res_entry': [self.sim.gui.air_res_entry.get(), 'entry'],
-                                'friction_entry': [self.sim.gui.friction_entry.get(), 'entry'],
-                                'temp_sc': [self.sim.gui.temp_sc.get(), 'set'],
-                                'speed_sc': [self.sim.gui.speed_sc.get(), 'set'],
-                                'show_fps': [self.sim.gui.show_fps.get(), 'set'],
-                                'show_num': [self.sim.gui.show_num.get(), 'set'],
-                                'show_links': [self.sim.gui.show_links.get(), 'set'],
-                                'top_bool': [self.sim.gui.top_bool.get(), 'set'],
-                                'bottom_bool': [self.sim.gui.bottom_bool.get(), 'set'],
-                                'left_bool': [self.sim.gui.left_bool.get(), 'set'],
-                                'right_bool': [self.sim.gui.right_bool.get(), 'set'],
-                                'grid_bool': [self.sim.gui.grid_bool.get(), 'set'],
-                                'grid_res_x_value': [self.sim.gui.grid_res_x_value.get(), 'set'],
-                                'grid_res_y_value': [self.sim.gui.grid_res_y_value.get(), 'set'],
-                                'delay_entry': [self.sim.gui.delay_entry.get(), 'entry'],
-                                'calculate_radii_diff_bool': [self.sim.gui.calculate_radii_diff_bool.get(), 'set'],
-                                'g_dir': [self.sim.g_dir, 'var'],
-                                'wind_force': [self.sim.wind_force, 'var'],
-                                'stress_visualization': [self.sim.stress_visualization, 'var'],
-                                'bg_color': [self.sim.bg_color, 'var'],
-                                'void_edges': [self.sim.void_edges, 'var'],
-                                'code': [self.sim.code, 'var']
-                                }
-
-                particle_settings = {'radius_entry': [self.sim.gui.radius_entry.get(), 'entry'],
-                                     'color_entry': [self.sim.gui.color_entry.get(), 'entry'],
-                                     'mass_entry': [self.sim.gui.mass_entry.get(), 'entry'],
-                                     'velocity_x_entry': [self.sim.gui.velocity_x_entry.get(), 'entry'],
-                                     'velocity_y_entry': [self.sim.gui.velocity_y_entry.get(), 'entry'],
-                                     'bounciness_entry': [self.sim.gui.bounciness_entry.get(), 'entry'],
-                                     'do_collision_bool': [self.sim.gui.do_collision_bool.get(), 'set'],
-                                     'locked_bool': [self.sim.gui.locked_bool.get(), 'set'],
-                                     'linked_group_bool': [self.sim.gui.linked_group_bool.get(), 'set'],
-                                     'attr_r_entry': [self.sim.gui.attr_r_entry.get(), 'entry'],
-                                     'repel_r_entry': [self.sim.gui.repel_r_entry.get(), 'entry'],
-                                     'attr_strength_entry': [self.sim.gui.attr_strength_entry.get(), 'entry'],
-                                     'gravity_mode_bool': [self.sim.gui.gravity_mode_bool.get(), 'set'],
-                                     'repel_strength_entry': [self.sim.gui.repel_strength_entry.get(), 'entry'],
-                                     'link_attr_break_entry': [self.sim.gui.link_attr_break_entry.get(), 'entry'],
-                                     'link_repel_break_entry': [self.sim.gui.link_repel_break_entry.get(), 'entry'],
-                                     'groups_entry': [self.sim.gui.groups_entry.get(), 'entry'],
-                                     'separate_group_bool': [self.sim.gui.separate_group_bool.get(), 'set']
-                                     }
-
-                data = {'particles': [particle.return_dict() for particle in self.sim.particles],
-                        'particle-settings': particle_settings,
-                        'sim-settings': sim_settings}
-
-                pickle.dump(data, open(filename, "wb"))
-
+                # Only collecting the state has to happen between two frames, writing it is done in the background
+                threading.Thread(target=self.write, args=(self.return_data(), filename)).start()
                 self.file_location, self.filename = os.path.split(filename)
             except Exception as error:
                 self.sim.error = ('Saving-Error', error)
 
-    def load(self):
+    def write(self, data, filename, compress=False):
+        try:
+            # Written to a temporary file first, so a crash never leaves a half-written simulation behind
+            temp_filename = filename + '.tmp'
+            with (gzip.open(temp_filename, 'wb', compresslevel=3) if compress else open(temp_filename, 'wb')) as file:
+                pickle.dump(data, file)
+            os.replace(temp_filename, filename)
+        except Exception as error:
+            self.sim.error = ('Saving-Error', error)
+
+    def autosave(self):
+        if self.autosave_interval <= 0 or time.time() - self.last_autosave < self.autosave_interval:
+            return
+        if self.writer is not None and self.writer.is_alive():
+            return
+
+        self.last_autosave = time.time()
+        filename = os.path.join(self.checkpoint_location,
+                                f'checkpoint_{time.strftime("%Y-%m-%d_%H-%M-%S")}_{self.sim.step_count}.sim')
+        self.writer = threading.Thread(target=self.write_checkpoint, args=(self.return_data(), filename), daemon=True)
+        self.writer.start()
+
+    def write_checkpoint(self, data, filename):
+        os.makedirs(self.checkpoint_location, exist_ok=True)
+        self.write(data, filename, compress=True)
+        checkpoints = self.return_checkpoints()
+        for old_filename in checkpoints[:max(len(checkpoints) - self.max_checkpoints, 0)]:
+            try:
+                os.remove(old_filename)
+            except OSError:
+                pass
+
+    def return_checkpoints(self):
+        if not os.path.isdir(self.checkpoint_location):
+            return []
+        filenames = [os.path.join(self.checkpoint_location, filename)
+                     for filename in os.listdir(self.checkpoint_location)
+                     if filename.startswith('checkpoint_') and filename.endswith('.sim')]
+        return sorted(filenames, key=os.path.getmtime)
+
+    def resume(self):
+        # Loads the latest checkpoint, returns False if there is none
+        checkpoints = self.return_checkpoints()
+        if len(checkpoints) == 0:
+            return False
+
+        self.load(checkpoints[-1])
+        return True
+
+    def read(self, filename):
+        with open(filename, 'rb') as file:
+            compressed = file.read(2) == b'\x1f\x8b'
+        with (gzip.open(filename, 'rb') if compressed else open(filename, 'rb')) as file:
+            return pickle.load(file)
+
+    def load(self, filename=None):
         if not self.sim.paused:
             self.sim.toggle_paused()
 
-        filename = askopenfilename(initialdir=self.file_location,
-                                   initialfile=self.filename,
-                                   defaultextension=".sim",
-                                   filetypes=[("Simulation files", '*.sim'), ("All Files", "*.*")])
+        if filename is None:
+            filename = filedialog.askopenfilename(initialdir=self.file_location,
+                                                  initialfile=self.filename,
+                                                  defaultextension=".sim",
+                                                  filetypes=[("Simulation files", '*.sim'), ("All Files", "*.*")])
 
         if filename != '':
             try:
-                data = pickle.load(open(filename, "rb"))
-
-                for key, value in list(data['particle-settings'].items()) + list(data['sim-settings'].items()):
-                    if value[1] == 'set':
-                        vars(self.sim.gui)[key].set(value[0])
-                    elif value[1] == 'var':
-                        vars(self.sim)[key] = value[0]
-                    else:
-                        vars(self.sim.gui)[key].delete(0, END)
-                        vars(self.sim.gui)[key].insert(0, value[0])
-
-                temp = self.sim.particles.copy()
-                for p in temp:
-                    p.delete()
-
-                self.sim.groups = {}
-                self.sim.gui.group_indices = []
-                self.sim.gui.groups_entry['values'] = []
-                for i in range(len(data['particles'])):
-                    Particle(self.sim, 0, 0, group=data['particles'][i]['group'])
-
-                for i, d in enumerate(data['particles']):
-                    particle = self.sim.particles[i]
-
-                    for key, value in d.items():
-                        vars(particle)[key] = value
-                    particle.sim = self.sim
-                    particle.init_constants()
-
-                    particle.linked = [self.sim.particles[index] for index in particle.linked]
-                    particle.link_lengths = {self.sim.particles[index]: value for index, value in
-                                             particle.link_lengths.items()}
+                data = self.read(filename)
+                self.apply_data(data)
 
                 self.file_location, self.filename = os.path.split(filename)
             except Exception as error:
                 self.sim.error = ('Loading-Error', error)
+
+    def apply_data(self, data):
+        grid_res = [None, None]
+        for key, value in list(data['particle-settings'].items()) + list(data['sim-settings'].items()):
+            if key == 'precision':
+                # Only stored to know it, the precision passed to the Simulation is kept
+                continue
+            elif value[1] == 'var':
+                vars(self.sim)[key] = value[0]
+            elif self.sim.gui is None:
+                if key in SIM_SETTINGS:
+                    try:
+                        self.sim.settings.set(key, value[0])
+                    except:
+                        pass
+                elif key in ('grid_res_x_value', 'grid_res_y_value'):
+                    grid_res[key == 'grid_res_y_value'] = value[0]
+            elif value[1] == 'set':
+                vars(self.sim.gui)[key].set(value[0])
+            else:
+                vars(self.sim.gui)[key].delete(0, END)
+                vars(self.sim.gui)[key].insert(0, value[0])
+
+        self.sim.remove_particles(self.sim.particles)
+
+        if None not in grid_res:
+            self.sim.grid = self.sim.create_grid(*grid_res)
+
+        self.sim.groups = {}
+        if self.sim.gui is not None:
+            self.sim.gui.group_indices = []
+            self.sim.gui.groups_entry['values'] = []
+        for i in range(len(data['particles'])):
+            Particle(self.sim, 0, 0, group=data['particles'][i]['group'])
+
+        for i, d in enumerate(data['particles']):
+            particle = self.sim.particles[i]
+
+            for key, value in d.items():
+                vars(particle)[key] = value
+            # Older saves and other precisions get converted to the one of the simulation
+            for key in ['v', 'a', 'far_a']:
+                if key in d:
+                    vars(particle)[key] = np.array(d[key], dtype=self.sim.precision)
+            particle.sim = self.sim
+            particle.init_constants()
+
+            particle.linked = [self.sim.particles[index] for index in particle.linked]
+            particle.link_lengths = {self.sim.particles[index]: value for index, value in
+                                     particle.link_lengths.items()}
+
+        self.sim.structure_changes += 1
+        self.sim.colliders = [collider_from_dict(d) for d in data.get('colliders', [])]
+        self.sim.emitters = []
+        for d in data.get('emitters', []):
+            emitter_from_dict(self.sim, d)
+        self.sim.sinks = []
+        for d in data.get('sinks', []):
+            Sink(self.sim, **d)
+        self.sim.history.clear()
@@ -0,0 +1,171 @@
+from particle_simulator import *
+import inspect
+
+
+class Scene:
+    def __init__(self, x, y, edges=None, lengths=None, **settings):
+        self.x = np.asarray(x, dtype='float64').ravel()
+        self.y = np.asarray(y, dtype='float64').ravel()
+        self.edges = np.zeros((0, 2), dtype=int) if edges is None else np.asarray(edges, dtype=int).reshape(-1, 2)
+        self.lengths = lengths  # None or 'repel' (normal links), 'fit' or the rest lengths
+        self.settings = settings
+
+    def __len__(self):
+        return len(self.x)
+
+    def return_lengths(self):
+        if isinstance(self.lengths, str) and self.lengths == 'fit':
+            return np.hypot(self.x[self.edges[:, 0]] - self.x[self.edges[:, 1]],
+                            self.y[self.edges[:, 0]] - self.y[self.edges[:, 1]])
+        if self.lengths is None or (isinstance(self.lengths, str) and self.lengths == 'repel'):
+            return None
+        return np.broadcast_to(np.asarray(self.lengths, dtype='float64'), len(self.edges))
+
+    def build(self, sim):
+        particles = sim.add_particles(self.x, self.y, **self.settings)
+        if len(self.edges) > 0:
+            sim.link_pairs(self.edges[:, 0], self.edges[:, 1], self.return_lengths(), particles=particles)
+
+        return particles
+
+    def return_dicts(self, seed=None):
+        amount = len(self)
+        settings = {key: value for key, value in return_defaults().items() if key in ATTRIBUTE_NAMES}
+        settings.update(self.settings)
+        columns = {ATTRIBUTE_NAMES[key]: column for key, column in settings_to_columns(settings, amount).items()}
+
+        colors = columns.get('color', ['random'] * amount)
+        rng = np.random.default_rng(seed)
+        columns['color'] = [rng.integers(0, 255, 3).tolist() if color == 'random' else color for color in colors]
+        if 'v' in columns:
+            # Loading converts it to the precision of the simulation
+            columns['v'] = [np.array(v, dtype='float64') for v in columns['v']]
+
+        dictionaries = [{'x': x, 'y': y, 'linked': [], 'link_lengths': {}}
+                        for x, y in zip(self.x.tolist(), self.y.tolist())]
+        for key, column in columns.items():
+            for dictionary, value in zip(dictionaries, column):
+                dictionary[key] = value
+
+        lengths = self.return_lengths()
+        lengths = ['repel'] * len(self.edges) if lengths is None else lengths.tolist()
+        for (a, b), length in zip(self.edges.tolist(), lengths):
+            if a == b:
+                continue
+            for i, j in ((a, b), (b, a)):
+                if j not in dictionaries[i]['link_lengths']:
+                    dictionaries[i]['linked'].append(j)
+                dictionaries[i]['link_lengths'][j] = length
+
+        return dictionaries
+
+    def save(self, filename, sim_settings=None, particle_settings=None, seed=None):
+        data = {'particles': self.return_dicts(seed),
+                'particle-settings': {} if particle_settings is None else particle_settings,
+                'sim-settings': {} if sim_settings is None else sim_settings}
+
+        with open(filename, "wb") as file:
+            pickle.dump(data, file)
+
+
+def return_defaults():
+    return {key: parameter.default for key, parameter in inspect.signature(Particle).parameters.items()}
+
+
+def combine(*scenes):
+    # Settings missing in some of the scenes get the default value of the Particle-class there
+    defaults = return_defaults()
+    offsets = np.cumsum([0] + [len(scene) for scene in scenes])
+    settings = {}
+    for key in {key for scene in scenes for key in scene.settings}:
+        settings[key] = sum((settings_to_columns({key: scene.settings.get(key, defaults[key])}, len(scene))[key]
+                             for scene in scenes), [])
+
+    lengths = [scene.return_lengths() for scene in scenes if len(scene.edges) > 0]
+    if all(length is None for length in lengths):
+        lengths = None
+    elif any(length is None for length in lengths):
+        raise ValueError("Can't combine scenes with normal links and scenes with rest lengths")
+    else:
+        lengths = np.concatenate(lengths)
+
+    return Scene(np.concatenate([scene.x for scene in scenes]), np.concatenate([scene.y for scene in scenes]),
+                 np.concatenate([scene.edges + offset for scene, offset in zip(scenes, offsets)]), lengths,
+                 **settings)
+
+
+def grid_positions(cols, rows, spacing, x, y):
+    iy, ix = np.mgrid[0:rows, 0:cols]
+    return x + ix.ravel() * spacing, y + iy.ravel() * spacing
+
+
+def neighbour_edges(cols, rows, offsets):
+    index = np.arange(rows * cols).reshape(rows, cols)
+    edges = []
+    for dy, dx in offsets:
+        if abs(dy) >= rows or abs(dx) >= cols:
+            continue
+        # Pairs (row, col) -> (row + dy, col + dx) that stay inside the lattice
+        a = index[max(-dy, 0):rows - max(dy, 0), max(-dx, 0):cols - max(dx, 0)]
+        b = index[max(dy, 0):rows + min(dy, 0), max(dx, 0):cols + min(dx, 0)]
+        edges.append(np.column_stack([a.ravel(), b.ravel()]))
+
+    return np.concatenate(edges) if edges else np.zeros((0, 2), dtype=int)
+
+
+def cloth(cols=10, rows=10, spacing=40, x=10, y=10, diagonals=True, **settings):
+    offsets = [(0, 1), (1, 0)] + ([(1, 1), (1, -1)] if diagonals else [])
+    settings = {'repel_r': spacing, 'attraction_strength': 500, 'linked_group_particles': False, **settings}
+    return Scene(*grid_positions(cols, rows, spacing, x, y), neighbour_edges(cols, rows, offsets), 'fit', **settings)
+
+
+def rope(amount=30, spacing=20, x=10, y=10, angle=90, fit_link=False, **settings):
+    # Same angle-convention as the gravity-angle: 0° points down, 90° to the right
+    rads = np.radians(angle)
+    distances = np.arange(amount) * spacing
+    edges = np.column_stack([np.arange(amount - 1), np.arange(1, amount)])
+    settings = {'repel_r': spacing, 'attraction_strength': 500, 'linked_group_particles': False, **settings}
+    return Scene(x + distances * np.sin(rads), y + distances * np.cos(rads), edges,
+                 'fit' if fit_link else None, **settings)
+
+
+def lattice(cols=5, rows=10, spacing=30, x=10, y=10, link_radius=None, **settings):
+    # Fit-links every pair closer than link_radius, which defaults to the direct and diagonal neighbours
+    if link_radius is None:
+        link_radius = spacing * 1.5
+    reach = int(min(link_radius / spacing, max(cols, rows)))
+    offsets = [(dy, dx) for dy in range(0, reach + 1) for dx in range(-reach, reach + 1)
+               if (dy > 0 or dx > 0) and (dy ** 2 + dx ** 2) * spacing ** 2 <= link_radius ** 2]
+    settings = {'repel_r': spacing, 'attraction_strength': 40, 'repulsion_strength': 1.5, 'mass': 10,
+                'linked_group_particles': False, 'separate_group': True, **settings}
+    return Scene(*grid_positions(cols, rows, spacing, x, y), neighbour_edges(cols, rows, offsets), 'fit', **settings)
+
+
+def fluid_block(cols=15, rows=10, spacing=10, x=10, y=10, jitter=0.5, seed=None, **settings):
+    rng = np.random.default_rng(seed)
+    xs, ys = grid_positions(cols, rows, spacing, x, y)
+    xs = xs + rng.uniform(-jitter, jitter, len(xs))
+    ys = ys + rng.uniform(-jitter, jitter, len(ys))
+    settings = {'repel_r': spacing * 1.5, 'attraction_strength': 0, 'repulsion_strength': 1, **settings}
+    return Scene(xs, ys, **settings)
+
+
+def orbit_system(x, y, central_mass=10 ** 5, central_radius=10, orbits=range(50, 300, 20), mass=1, radius=5,
+                 attraction_constant=10 ** -3, **settings):
+    # Planets start on circular orbits around the central mass (the gravity-mode force is 10 * G * m1 * m2 / d²)
+    orbits = np.asarray(orbits, dtype='float64')
+    speeds = np.sqrt(attraction_constant * 20 * central_mass / orbits)
+    amount = len(orbits) + 1
+
+    masses = np.broadcast_to(np.asarray(mass, dtype='float64'), orbits.shape)
+    radii = np.broadcast_to(np.asarray(radius), orbits.shape)
+    velocities = np.zeros((amount, 2))
+    velocities[1:, 1] = speeds
+
+    settings = {'radius': np.concatenate([[central_radius], radii]).astype(int),
+                'mass': np.concatenate([[central_mass], masses]),
+                'velocity': velocities,
+                'repel_r': np.concatenate([[central_radius], radii]),
+                'attract_r': -1, 'attraction_strength': attraction_constant, 'gravity_mode': True,
+                'bounciness': 0.7, **settings}
+    return Scene(np.concatenate([[x], x + orbits]), np.full(amount, y, dtype='float64'), **settings)
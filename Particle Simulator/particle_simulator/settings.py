@@ -0,0 +1,67 @@
+from particle_simulator import *
+
+
+# Key in the save-files -> simulation-attribute, type and the GUI-variable the widget writes into
+SIM_SETTINGS = {'gravity_entry': ('g', float, 'gravity_var'),
+                'air_res_entry': ('air_res', float, 'air_res_var'),
+                'friction_entry': ('ground_friction', float, 'friction_var'),
+                'temp_sc': ('temperature', float, 'temp_var'),
+                'speed_sc': ('speed', float, 'speed_var'),
+                'show_fps': ('show_fps', bool, 'show_fps'),
+                'show_num': ('show_num', bool, 'show_num'),
+                'show_links': ('show_links', bool, 'show_links'),
+                'top_bool': ('top', bool, 'top_bool'),
+                'bottom_bool': ('bottom', bool, 'bottom_bool'),
+                'left_bool': ('left', bool, 'left_bool'),
+                'right_bool': ('right', bool, 'right_bool'),
+                'grid_bool': ('use_grid', bool, 'grid_bool'),
+                'delay_entry': ('min_spawn_delay', float, 'delay_var'),
+                'calculate_radii_diff_bool': ('calculate_radii_diff', bool, 'calculate_radii_diff_bool')}
+
+
+def parse_setting(value, kind):
+    if isinstance(value, str):
+        try:
+            return kind(value)
+        except ValueError:
+            # Entries can also hold expressions, eg. '1/3'
+            return kind(eval(value))
+    return kind(value)
+
+
+class Settings:
+    # Keeps the simulation-attributes in sync with the sidebar: a value is only parsed when its widget changes,
+    # the simulation itself only reads its own attributes
+    def __init__(self, sim):
+        self.sim = sim
+        if self.sim.gui is None:
+            return
+
+        for key, (attribute, kind, variable) in SIM_SETTINGS.items():
+            variable = vars(self.sim.gui)[variable]
+            variable.trace("w", lambda *event, key=key, variable=variable: self.changed(key, variable))
+            self.changed(key, variable)
+
+    def changed(self, key, variable):
+        attribute, kind, _ = SIM_SETTINGS[key]
+        try:
+            value = variable.get()
+            vars(self.sim)[attribute] = parse_setting(value, kind)
+        except Exception:
+            # Incomplete input (eg. while typing) keeps the last valid value
+            return
+        if self.sim.recorder is not None:
+            self.sim.recorder.record('settings.set', key, value)
+
+    def set(self, key, value):
+        # Changes a setting from code, the widget is updated as well if there is one
+        attribute, kind, variable = SIM_SETTINGS[key]
+        if self.sim.gui is None:
+            vars(self.sim)[attribute] = parse_setting(value, kind)
+        else:
+            vars(self.sim.gui)[variable].set(value)
+
+    def return_values(self):
+        # Save-file entries of the settings, read from the simulation-attributes
+        return {key: [str(vars(self.sim)[attribute]), 'entry'] if key.endswith('_entry') else
+                [vars(self.sim)[attribute], 'set'] for key, (attribute, kind, variable) in SIM_SETTINGS.items()}
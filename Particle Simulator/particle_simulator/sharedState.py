@@ -0,0 +1,163 @@
+from particle_simulator import *
+
+shared_memory = LazyModule('multiprocessing.shared_memory')
+resource_tracker = LazyModule('multiprocessing.resource_tracker')
+
+# Header: sequence (odd while writing), frame (step), particles, links, capacity, link-capacity, generation
+HEADER_FIELDS = ['sequence', 'frame', 'count', 'link_count', 'capacity', 'link_capacity', 'generation']
+# Name, dtype, columns (per particle or, for the links, per link)
+ARRAYS = [('positions', 'float64', 2), ('velocities', 'float64', 2), ('colors', 'uint8', 3), ('links', 'int32', 2)]
+
+
+def return_array(block, dtype, rows, columns):
+    return np.ndarray((rows, columns), dtype=dtype, buffer=block.buf)
+
+
+# Blocks created by exports in this process, the resource-tracker already knows them
+exported = set()
+
+
+def attach(name):
+    # Readers shouldn't remove the blocks when they exit, only the exporter owns them
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+        # Python < 3.13
+        block = shared_memory.SharedMemory(name)
+        if name not in exported:
+            resource_tracker.unregister(block._name, 'shared_memory')
+        return block
+
+
+class SharedExport:
+    # Publishes the particle-arrays into named shared-memory blocks, readers attach with SharedReader(name)
+    def __init__(self, sim, name='particle_simulator', interval=1):
+        self.sim = sim
+        self.name = name
+        self.interval = interval
+
+        self.header_block = shared_memory.SharedMemory(name, create=True, size=8 * len(HEADER_FIELDS))
+        exported.add(name)
+        self.header = np.ndarray(len(HEADER_FIELDS), dtype='int64', buffer=self.header_block.buf)
+        self.header[:] = 0
+        self.blocks = {}
+        self.arrays = {}
+
+        self.sim.shared_export = self
+        self.publish()
+
+    def allocate(self, capacity, link_capacity):
+        # Growing creates new blocks under the next generation-name, readers re-attach when they notice it
+        old_blocks = self.blocks
+        generation = int(self.header[6]) + 1
+        self.blocks, self.arrays = {}, {}
+        for key, dtype, columns in ARRAYS:
+            rows = link_capacity if key == 'links' else capacity
+            block = shared_memory.SharedMemory(f'{self.name}_{key}_{generation}', create=True,
+                                               size=max(rows * columns * np.dtype(dtype).itemsize, 1))
+            exported.add(block.name)
+            self.blocks[key] = block
+            self.arrays[key] = return_array(block, dtype, rows, columns)
+
+        self.header[4:7] = capacity, link_capacity, generation
+        for block in old_blocks.values():
+            block.close()
+            block.unlink()
+            exported.discard(block.name)
+
+    def publish(self):
+        if self.sim.step_count % self.interval != 0:
+            return
+
+        particles = self.sim.particles
+        indices = {p: i for i, p in enumerate(particles)}
+        links = [(i, indices[link]) for i, p in enumerate(particles) for link in p.linked if i < indices.get(link, -1)]
+        count, link_count = len(particles), len(links)
+
+        self.header[0] += 1
+        if count > self.header[4] or link_count > self.header[5] or len(self.blocks) == 0:
+            self.allocate(max(count * 2, 1024), max(link_count * 2, 1024))
+
+        if count > 0:
+            self.arrays['positions'][:count] = [[p.x, p.y] for p in particles]
+            self.arrays['velocities'][:count] = [p.v for p in particles]
+            self.arrays['colors'][:count] = [p.color for p in particles]
+        if link_count > 0:
+            self.arrays['links'][:link_count] = links
+        self.header[1:4] = self.sim.step_count, count, link_count
+        self.header[0] += 1
+
+    def close(self):
+        for block in list(self.blocks.values()) + [self.header_block]:
+            block.close()
+            block.unlink()
+            exported.discard(block.name)
+        self.blocks = {}
+        self.sim.shared_export = None
+
+
+class SharedReader:
+    # Attaches to the blocks of a SharedExport (also from other processes), eg.
+    # reader = SharedReader('particle_simulator'); frame, arrays = reader.read()
+    def __init__(self, name='particle_simulator'):
+        self.name = name
+        self.header_block = attach(name)
+        self.header = np.ndarray(len(HEADER_FIELDS), dtype='int64', buffer=self.header_block.buf)
+        self.generation = None
+        self.blocks = {}
+        self.arrays = {}
+
+    def return_header(self):
+        return dict(zip(HEADER_FIELDS, self.header.tolist()))
+
+    def reattach(self):
+        generation = int(self.header[6])
+        capacity, link_capacity = int(self.header[4]), int(self.header[5])
+        blocks = self.blocks
+        self.blocks, self.arrays = {}, {}
+        for block in blocks.values():
+            try:
+                block.close()
+            except BufferError:
+                # Views returned earlier still use it
+                pass
+        for key, dtype, columns in ARRAYS:
+            block = attach(f'{self.name}_{key}_{generation}')
+            self.blocks[key] = block
+            self.arrays[key] = return_array(block, dtype, link_capacity if key == 'links' else capacity, columns)
+        self.generation = generation
+
+    def view(self):
+        # Zero-copy views of the current arrays, they can change while they are being used
+        if self.generation != self.header[6]:
+            self.reattach()
+        count, link_count = int(self.header[2]), int(self.header[3])
+        return {key: array[:link_count if key == 'links' else count] for key, array in self.arrays.items()}
+
+    def read(self, retries=1000):
+        # Consistent copy of one frame: retried until no write happened in between (seqlock)
+        for _ in range(retries):
+            sequence = int(self.header[0])
+            if sequence % 2 == 1:
+                time.sleep(0)
+                continue
+            try:
+                arrays = {key: array.copy() for key, array in self.view().items()}
+            except FileNotFoundError:
+                continue
+            frame = int(self.header[1])
+            if int(self.header[0]) == sequence:
+                return frame, arrays
+        raise TimeoutError(f"Couldn't read a consistent frame from '{self.name}'")
+
+    def wait(self, frame, timeout=None):
+        # Blocks until a frame newer than the given one was published
+        start = time.time()
+        while int(self.header[1]) <= frame and (timeout is None or time.time() - start < timeout):
+            time.sleep(0.001)
+        return int(self.header[1])
+
+    def close(self):
+        for block in list(self.blocks.values()) + [self.header_block]:
+            block.close()
+        self.blocks = {}
@@ -3,9 +3,22 @@ from particle_simulator import *
 
 class Simulation:
     def __init__(self, width=650, height=600, title="Simulation", gridres=(50, 50),
-                 temperature=0, g=0.1, air_res=0.05, ground_friction=0, fps_update_delay=0.5):
+                 temperature=0, g=0.1, air_res=0.05, ground_friction=0, fps_update_delay=0.5, headless=False,
+                 startup_report=False, canvas_size=None, sparse_grid=False, precision='float64', seed=None):
+        # Seconds since the package started importing, printed after the first frame with startup_report=True
+        self.startup_times = dict(STARTUP_TIMES)
+        self.startup_report = startup_report
+        self.set_seed(seed)
+        self.recorder = None
+        self.actions = []  # keyboard-input of the listener-thread, run between two frames
+        # width and height are the size of the world, the canvas only shows the part of it the camera looks at
         self.width = width
         self.height = height
+        self.canvas_width, self.canvas_height = (width, height) if canvas_size is None else canvas_size
+        self.camera = Camera(self)
+        # dtype of the particle-state (velocities, accelerations) and of the calculations moving it, the positions are
+        # rounded to it every step as well
+        self.precision = precision
         
         self.temperature = temperature
         self.g = g  # gravity
@@ -14,6 +27,7 @@ class Simulation:
         self.wind_force = np.array([0, 0])
         self.air_res = air_res
         self.air_res_calc = 1 - self.air_res
+        self.constants_key = None  # settings g_vector and air_res_calc were last calculated from
         self.ground_friction = ground_friction
         self.speed = 1
 
@@ -38,7 +52,21 @@ class Simulation:
         self.focus = True
         self.error = None
         self.use_grid = True
+        self.sparse_grid = sparse_grid  # hash-grid that also covers particles outside of the world
         self.calculate_radii_diff = False
+        self.allow_sleeping = False
+        self.sleep_threshold = 0.05  # kinetic energy below which a particle counts as still
+        self.sleep_delay = 30  # frames an island has to stay still before falling asleep
+        self.sleeping_count = 0
+        self.prev_settings = None
+        self.far_field_interval = 1  # steps between far-field force updates, 1 recalculates them every step
+        self.group_far_field_intervals = {}  # per-group overrides of far_field_interval
+        self.near_field_radius = 50
+        self.step_count = 0
+        self.adaptive_timestep = False
+        self.cfl = 0.5  # max. fraction of the smallest radius / link length a particle may travel per substep
+        self.max_substeps = 10
+        self.substeps = 1
 
         self.top = True
         self.bottom = True
@@ -47,76 +75,167 @@ class Simulation:
         self.void_edges = False
 
         self.bg_color = [[255, 255, 255], "#ffffff"]
+        self.show_fps = True
+        self.show_num = True
+        self.show_links = True
+        # Above lod_threshold visible particles or below lod_zoom, particles are splatted instead of drawn as circles
+        self.lod_threshold = 20000
+        self.lod_zoom = 0.25
+        self.lod_mode = 'color'  # 'color': average color, 'density': heatmap of the particle-count
         self.stress_visualization = False
         self.link_colors = []
+        self.breaking_links = []  # (particle, particle) pairs that exceeded their breaking-force during this step
+        self.broken_links = 0  # links that broke in the last step
+        self.integration_buffers = {}  # scratch-arrays of integrate(), only replaced when there are more particles
+        self.integrated = None  # particles of the last integrate(), while its 'state'-buffer still matches them
+        self.stepping = False
+        self.structure_changes = 0  # counts removed particles and changed links, index-arrays are cached by it
 
         self.code = 'print("Hello World")'
 
-        self.gui = GUI(self, title, gridres)
-        self.grid = Grid(self, *gridres)
+        # Headless simulations have no window and can only be advanced with step()
+        self.gui = None if headless else GUI(self, title, gridres)
+        self.startup_times['window'] = time.perf_counter() - IMPORT_START
+        self.grid = self.create_grid(*gridres)
         self.save_manager = SaveManager(self)
-
-        # Keyboard- and mouse-controls
-        self.gui.canvas.bind('<B1-Motion>', self.mouse_m)
-        self.gui.canvas.bind('<Button-1>', self.mouse_p)
-        self.gui.canvas.bind('<ButtonRelease-1>', self.mouse_r)
-        self.gui.canvas.bind('<B3-Motion>', self.right_mouse)
-        self.gui.canvas.bind('<Button-3>', self.right_mouse)
-        self.gui.canvas.bind("<MouseWheel>", self.on_scroll)
-
-        self.listener = Listener(on_press=self.on_press, on_release=self.on_release)
-        self.listener.start()
+        self.history = History(self)
+        self.observables = Observables(self)
+        self.stream_server = None
+        self.shared_export = None
+        self.settings = Settings(self)
+
+        if not headless:
+            # Keyboard- and mouse-controls
+            self.gui.canvas.bind('<B1-Motion>', self.camera.world_event(self.mouse_m))
+            self.gui.canvas.bind('<Button-1>', self.camera.world_event(self.mouse_p))
+            self.gui.canvas.bind('<ButtonRelease-1>', self.camera.world_event(self.mouse_r))
+            self.gui.canvas.bind('<B3-Motion>', self.camera.world_event(self.right_mouse))
+            self.gui.canvas.bind('<Button-3>', self.camera.world_event(self.right_mouse_p))
+            self.gui.canvas.bind('<Button-2>', self.camera.pan_p)
+            self.gui.canvas.bind('<B2-Motion>', self.camera.pan_m)
+            self.gui.canvas.bind("<MouseWheel>", self.on_scroll)
+
+            self.listener = keyboard.Listener(on_press=self.on_press, on_release=self.on_release)
+            self.listener.start()
 
         self.start_time = time.time()
         self.prev_time = self.start_time
 
         self.particles = []
         self.selection = []
-        self.clipboard = []
+        self.clipboard = None
         self.pasting = False
         self.groups = {'group1': []}
+        self.colliders = []
+        self.emitters = []
+        self.sinks = []
+        self.despawned = []
+        self.startup_times['simulation'] = time.perf_counter() - IMPORT_START
+
+    def set_seed(self, seed=None):
+        # All random numbers of the simulation come from these generators, the same seed gives the same run
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.random = random.Random(seed)
+
+    def run_action(self, name, *args):
+        # Input that changes the simulation runs through here, so it can be recorded and replayed (see recorder.py),
+        # dotted names are attributes of attributes, eg. 'history.undo'
+        if self.recorder is not None:
+            self.recorder.record(name, *args)
+        function = self
+        for attribute in name.split('.'):
+            function = getattr(function, attribute)
+        return function(*args)
+
+    def queue_action(self, name, *args):
+        self.actions.append((name, args))
+
+    def run_actions(self):
+        while self.actions:
+            name, args = self.actions.pop(0)
+            self.run_action(name, *args)
+
+    def set_input_state(self, prev_mx, prev_my, mx, my, mr, mouse_mode):
+        self.prev_mx, self.prev_my, self.mx, self.my = prev_mx, prev_my, mx, my
+        self.mr = mr
+        self.mouse_mode = mouse_mode
+
+    def set_paused(self, paused):
+        self.paused = paused
+        if not self.paused:
+            self.selection = []
 
     def mouse_p(self, event):
         self.gui.canvas.focus_set()
         self.mouse_down_start = time.time()
         self.mouse_down = True
         if self.mouse_mode == 'SELECT' or self.mouse_mode == 'MOVE':
-            selected = False
-            for p in self.particles:
-                if p.mouse_p(event):
-                    selected = True
-            if not selected:
-                self.selection = []
-            elif self.mouse_mode == 'MOVE':
-                for particle in self.selection:
-                    particle.mouse = True
+            self.run_action('grab', event.x, event.y)
         elif self.mouse_mode == 'ADD':
-            if len(self.selection) > 0:
-                self.selection = []
-
+            self.run_action('start_adding')
             self.add_particle(event.x, event.y)
 
     def mouse_m(self, event):
         if self.mouse_mode == 'SELECT':
-            for p in self.particles:
-                p.mouse_p(event)
+            self.run_action('select_at', event.x, event.y)
         elif self.mouse_mode == 'ADD' and time.time() - self.last_mouse_time >= self.min_spawn_delay:
             self.add_particle(event.x, event.y)
 
     def mouse_r(self, event):
         self.mouse_down = False
+        self.run_action('release')
+
+    def right_mouse_p(self, event):
+        # One brush-stroke is one step in the history
+        self.run_action('history.begin')
+        self.right_mouse(event)
+
+    def right_mouse(self, event):
+        self.gui.canvas.focus_set()
+        self.run_action('erase', event.x, event.y)
+
+    def grab(self, x, y):
+        event = Event()
+        event.x, event.y = x, y
+        selected = False
+        for p in self.particles:
+            if p.mouse_p(event):
+                selected = True
+        if not selected:
+            self.selection = []
+        elif self.mouse_mode == 'MOVE':
+            for particle in self.selection:
+                particle.mouse = True
+        if self.mouse_mode == 'MOVE':
+            dragged = [p for p in self.particles if p.mouse]
+            if dragged:
+                self.history.begin(dragged, neighbours=False)
+
+    def select_at(self, x, y):
+        event = Event()
+        event.x, event.y = x, y
+        for p in self.particles:
+            p.mouse_p(event)
+
+    def release(self):
         if self.mouse_mode == 'MOVE' or self.pasting:
             for p in self.particles:
                 if p.mouse:
-                    p.mouse_r(event)
+                    p.mouse_r(None)
         self.pasting = False
 
-    def right_mouse(self, event):
-        self.gui.canvas.focus_set()
-        temp = self.particles.copy()
-        for p in temp:
-            if np.sqrt((event.x - p.x) ** 2 + (event.y - p.y) ** 2) <= max(int(self.mr), p.r):
-                p.delete()
+    def start_adding(self):
+        if len(self.selection) > 0:
+            self.selection = []
+        self.history.begin()
+
+    def erase(self, x, y):
+        deleted = [p for p in self.particles
+                   if np.sqrt((x - p.x) ** 2 + (y - p.y) ** 2) <= max(int(self.mr), p.r)]
+        self.history.touch(deleted)
+        for p in deleted:
+            p.delete()
 
     def rotate_2d(self, x, y, cx, cy, angle):
         angle_rad = -np.radians(angle)
@@ -131,76 +250,125 @@ class Simulation:
         return x, y
 
     def on_scroll(self, event):
-        if self.rotate_mode:
-            for p in self.selection:
-                p.x, p.y = self.rotate_2d(p.x, p.y, event.x, event.y, event.delta / 500 * self.mr)
+        # CTRL + scroll to zoom (around the cursor)
+        if event.state & 0x0004:
+            self.camera.zoom_at(2 ** (event.delta / 500), event.x, event.y)
+        elif self.rotate_mode:
+            x, y = self.camera.to_world(event.x, event.y)
+            self.run_action('rotate_selection', x, y, event.delta / 500 * self.mr)
         else:
             self.mr = max(self.mr * 2 ** (event.delta / 500), 1)
 
     def on_press(self, key):
+        # Runs in the thread of the listener, changes to the simulation are queued until the current frame is done
         if self.focus:
             # SPACE to pause
-            if key == Key.space:
+            if key == keyboard.Key.space:
                 self.toggle_paused()
             # DELETE to delete
-            elif key == Key.delete:
-                temp = self.selection.copy()
-                for p in temp:
-                    p.delete()
-            elif key == Key.shift_l or key == Key.shift_r:
+            elif key == keyboard.Key.delete:
+                self.queue_action('delete_selection')
+            elif key == keyboard.Key.shift_l or key == keyboard.Key.shift_r:
                 self.shift = True
             # CTRL + A to select all
-            elif KeyCode.from_char(key).char == r"'\x01'":
-                for p in self.particles:
-                    p.select()
+            elif keyboard.KeyCode.from_char(key).char == r"'\x01'":
+                self.queue_action('select_all')
             # CTRL + C to copy
-            elif KeyCode.from_char(key).char == r"'\x03'":
-                self.copy_selected()
+            elif keyboard.KeyCode.from_char(key).char == r"'\x03'":
+                self.queue_action('copy_selected')
             # CTRL + V to copy
-            elif KeyCode.from_char(key).char == r"'\x16'":
-                self.paste()
+            elif keyboard.KeyCode.from_char(key).char == r"'\x16'":
+                self.queue_action('paste')
             # CTRL + X to cut
-            elif KeyCode.from_char(key).char == r"'\x18'":
-                self.cut()
+            elif keyboard.KeyCode.from_char(key).char == r"'\x18'":
+                self.queue_action('cut')
+            # CTRL + Z to undo and CTRL + Y to redo
+            elif keyboard.KeyCode.from_char(key).char == r"'\x1a'":
+                self.queue_action('history.undo')
+            elif keyboard.KeyCode.from_char(key).char == r"'\x19'":
+                self.queue_action('history.redo')
             # CTRL + L and CTRL + SHIFT + L to lock and 'unlock'
-            elif KeyCode.from_char(key).char == r"'\x0c'" and not self.shift:
-                for p in self.selection:
-                    p.locked = True
-            elif KeyCode.from_char(key).char == r"'\x0c'" and self.shift:
-                for p in self.selection:
-                    p.locked = False
+            elif keyboard.KeyCode.from_char(key).char == r"'\x0c'" and not self.shift:
+                self.queue_action('lock_selection')
+            elif keyboard.KeyCode.from_char(key).char == r"'\x0c'" and self.shift:
+                self.queue_action('unlock_selection')
             # L to link, SHIFT + L to unlink and ALT GR + L to fit-link
-            elif KeyCode.from_char(key).char == "'l'":
-                self.link_selection()
-            elif KeyCode.from_char(key).char == "<76>":
-                self.link_selection(fit_link=True)
-            elif KeyCode.from_char(key).char == "'L'":
-                self.unlink_selection()
+            elif keyboard.KeyCode.from_char(key).char == "'l'":
+                self.queue_action('link_selection')
+            elif keyboard.KeyCode.from_char(key).char == "<76>":
+                self.queue_action('link_selection', True)
+            elif keyboard.KeyCode.from_char(key).char == "'L'":
+                self.queue_action('unlink_selection')
             # R to enter rotate-mode
-            elif KeyCode.from_char(key).char == "'r'":
+            elif keyboard.KeyCode.from_char(key).char == "'r'":
                 self.rotate_mode = True
+            # F to follow the selection, HOME to reset the camera
+            elif keyboard.KeyCode.from_char(key).char == "'f'":
+                self.camera.follow = not self.camera.follow
+            elif key == keyboard.Key.home:
+                self.camera.reset()
             # CTRL + S to save
-            elif KeyCode.from_char(key).char == r"'\x13'":
+            elif keyboard.KeyCode.from_char(key).char == r"'\x13'":
                 self.start_save = True  # Threading-issues
             # CTRL + O to load / open
-            elif KeyCode.from_char(key).char == r"'\x0f'":
+            elif keyboard.KeyCode.from_char(key).char == r"'\x0f'":
                 self.start_load = True
 
     def on_release(self, key):
-        if key == Key.shift_l or key == Key.shift_r:
+        if key == keyboard.Key.shift_l or key == keyboard.Key.shift_r:
             self.shift = False
-        elif KeyCode.from_char(key).char == "'r'":
+        elif keyboard.KeyCode.from_char(key).char == "'r'":
             self.rotate_mode = False
 
+    def create_grid(self, rows, columns):
+        return (HashGrid if self.sparse_grid else Grid)(self, rows, columns)
+
     def update_grid(self, *event):
         try:
-            self.grid = Grid(self, self.gui.grid_res_x_value.get(), self.gui.grid_res_y_value.get())
+            self.run_action('set_grid', self.gui.grid_res_x_value.get(), self.gui.grid_res_y_value.get())
         except:
             pass
 
+    def set_grid(self, rows, columns):
+        self.grid = self.create_grid(rows, columns)
+
+    def set_sparse_grid(self, sparse_grid):
+        self.sparse_grid = sparse_grid
+        self.grid = self.create_grid(self.grid.rows, self.grid.columns)
+
+    def set_value(self, attribute, value):
+        # Settings of the extra-window, which has no save-file entries
+        vars(self)[attribute] = value
+
     def toggle_paused(self):
         self.toggle_pause = True
 
+    def delete_selection(self):
+        self.history.begin(self.selection)
+        temp = self.selection.copy()
+        for p in temp:
+            p.delete()
+
+    def select_all(self):
+        for p in self.particles:
+            p.select()
+
+    def lock_selection(self):
+        self.history.begin(self.selection, neighbours=False)
+        for p in self.selection:
+            p.locked = True
+
+    def unlock_selection(self):
+        self.history.begin(self.selection, neighbours=False)
+        for p in self.selection:
+            p.locked = False
+            self.wake_island(p)
+
+    def rotate_selection(self, x, y, angle):
+        for p in self.selection:
+            p.x, p.y = self.rotate_2d(p.x, p.y, x, y, angle)
+            self.wake_island(p)
+
     def change_mode(self, mode):
         self.mouse_mode = mode
         if mode == 'SELECT':
@@ -217,64 +385,77 @@ class Simulation:
             self.gui.gui_canvas.itemconfig(self.gui.add_rect, state='normal')
 
     def add_group(self):
-        for i in range(1, max(self.gui.group_indices) + 2):
-            if i not in self.gui.group_indices:
-                name = f'group{i}'
-                self.gui.group_indices.append(i)
-                self.gui.groups_entry['values'] = [f'group{index}' for index in sorted(self.gui.group_indices)]
-                self.gui.groups_entry.current(i - 1)
-                self.groups[name] = []
-                break
-
-    def select_group(self):
+        i = 1
+        while f'group{i}' in self.groups:
+            i += 1
+        self.groups[f'group{i}'] = []
+        if self.gui is not None:
+            self.gui.group_indices.append(i)
+            self.gui.groups_entry['values'] = [f'group{index}' for index in sorted(self.gui.group_indices)]
+            self.gui.groups_entry.set(f'group{i}')
+
+    def select_group(self, name):
         self.selection = []
-        for p in self.groups[self.gui.groups_entry.get()]:
+        for p in self.groups.get(name, []):
             p.select()
 
-    def inputs2dict(self):
+    def return_inputs(self):
+        # The unevaluated sidebar-entries, actions evaluate them themselves so a replay draws the same random numbers
+        return {'radius': self.gui.radius_entry.get(),
+                'color': self.gui.color_entry.get(),
+                'mass': self.gui.mass_entry.get(),
+                'velocity': [self.gui.velocity_x_entry.get(), self.gui.velocity_y_entry.get()],
+                'bounciness': self.gui.bounciness_entry.get(),
+                'attract_r': self.gui.attr_r_entry.get(),
+                'repel_r': self.gui.repel_r_entry.get(),
+                'attraction_strength': self.gui.attr_strength_entry.get(),
+                'repulsion_strength': self.gui.repel_strength_entry.get(),
+                'link_attr_breaking_force': self.gui.link_attr_break_entry.get(),
+                'link_repel_breaking_force': self.gui.link_repel_break_entry.get(),
+                'collisions': self.gui.do_collision_bool.get(),
+                'locked': self.gui.locked_bool.get(),
+                'linked_group_particles': self.gui.linked_group_bool.get(),
+                'group': self.gui.groups_entry.get(),
+                'separate_group': self.gui.separate_group_bool.get(),
+                'gravity_mode': self.gui.gravity_mode_bool.get()}
+
+    def inputs2dict(self, inputs):
         try:
-            radius = int(self.mr) if self.gui.radius_entry.get() == 'scroll' else eval(self.gui.radius_entry.get())
+            # 'random' in the entries is the generator of the simulation, eg. 'random.uniform(2, 6)'
+            namespace = {'random': self.random, 'rng': self.rng}
+            radius = int(self.mr) if inputs['radius'] == 'scroll' else eval(inputs['radius'], globals(), namespace)
 
             try:
-                color = self.gui.color_entry.get().replace('[', '').replace(']', '').split(',')
+                color = inputs['color'].replace('[', '').replace(']', '').split(',')
                 color = list(map(lambda x: int(x), color))
             except ValueError:
-                color = self.gui.color_entry.get()
-
-            kwargs = {'mass': self.gui.mass_entry.get(),
-                      'velocity': [self.gui.velocity_x_entry.get(), self.gui.velocity_y_entry.get()],
-                      'bounciness': self.gui.bounciness_entry.get(),
-                      'attract_r': self.gui.attr_r_entry.get(),
-                      'repel_r': self.gui.repel_r_entry.get(),
-                      'attraction_strength': self.gui.attr_strength_entry.get(),
-                      'repulsion_strength': self.gui.repel_strength_entry.get(),
-                      'link_attr_breaking_force': self.gui.link_attr_break_entry.get(),
-                      'link_repel_breaking_force': self.gui.link_repel_break_entry.get(),
-                      }
+                color = inputs['color']
+
+            kwargs = {key: inputs[key] for key in ['mass', 'bounciness', 'attract_r', 'repel_r', 'attraction_strength',
+                                                   'repulsion_strength', 'link_attr_breaking_force',
+                                                   'link_repel_breaking_force']}
+            kwargs['velocity'] = inputs['velocity'].copy()
 
             for key, value in kwargs.items():
                 try:
-                    kwargs[key] = eval(value)
+                    kwargs[key] = eval(value, globals(), namespace)
                 except TypeError:
                     for i, element in enumerate(value):
-                        kwargs[key][i] = eval(element)
+                        kwargs[key][i] = eval(element, globals(), namespace)
 
             kwargs['radius'] = radius
             kwargs['color'] = color
-            kwargs['collisions'] = self.gui.do_collision_bool.get()
-            kwargs['locked'] = self.gui.locked_bool.get()
-            kwargs['linked_group_particles'] = self.gui.linked_group_bool.get()
-            kwargs['group'] = self.gui.groups_entry.get()
-            kwargs['separate_group'] = self.gui.separate_group_bool.get()
-            kwargs['gravity_mode'] = self.gui.gravity_mode_bool.get()
+            for key in ['collisions', 'locked', 'linked_group_particles', 'group', 'separate_group', 'gravity_mode']:
+                kwargs[key] = inputs[key]
 
             return kwargs
         except Exception as error:
             self.error = ['Input-Error', error]
 
-    def set_selected(self):
-        kwargs = self.inputs2dict()
+    def set_selected(self, inputs):
+        kwargs = self.inputs2dict(inputs)
         if kwargs is not None:
+            self.history.begin(self.selection)
             temp = self.selection.copy()
             for p in temp:
                 temp_link_lengths = p.link_lengths.copy()
@@ -285,10 +466,11 @@ class Simulation:
                 for link, length in temp_link_lengths.items():
                     self.link([link, p], fit_link=length != 'repel', distance=length)
 
-    def set_all(self):
+    def set_all(self, inputs):
+        self.history.begin(self.particles, neighbours=False)
         temp = self.particles.copy()
         for p in temp:
-            kwargs = self.inputs2dict()  # Update for each particle in case of 'random'
+            kwargs = self.inputs2dict(inputs)  # Update for each particle in case of 'random'
             if kwargs is not None:
                 temp_link_lengths = p.link_lengths.copy()
                 px, py = p.x, p.y
@@ -340,55 +522,110 @@ class Simulation:
                         vars(self.gui)[key].delete(0, END)
 
     def add_particle(self, x, y):
-        kwargs = self.inputs2dict()
+        self.run_action('spawn', x, y, self.return_inputs())
+        self.last_mouse_time = time.time()
+
+    def spawn(self, x, y, inputs):
+        kwargs = self.inputs2dict(inputs)
         if kwargs is not None:
             Particle(self, x, y, **kwargs)
 
-            self.last_mouse_time = time.time()
+    def add_particles(self, x, y, **kwargs):
+        x, y = np.broadcast_arrays(np.atleast_1d(np.asarray(x, dtype='float64')),
+                                   np.atleast_1d(np.asarray(y, dtype='float64')))
+        columns = settings_to_columns(kwargs, len(x))
+
+        particles = [Particle(self, px, py, insert=False, **{key: column[i] for key, column in columns.items()})
+                     for i, (px, py) in enumerate(zip(x.tolist(), y.tolist()))]
+        self.insert_particles(particles)
+
+        return particles
+
+    def link_pairs(self, i, j, lengths=None, particles=None):
+        if particles is None:
+            particles = self.particles
+        i = np.atleast_1d(np.asarray(i, dtype=int))
+        j = np.atleast_1d(np.asarray(j, dtype=int))
+
+        if isinstance(lengths, str) and lengths == 'fit':
+            positions = np.array([[particles[index].x, particles[index].y] for index in range(len(particles))])
+            lengths = np.linalg.norm(positions[i] - positions[j], axis=1).tolist()
+        elif lengths is None or (isinstance(lengths, str) and lengths == 'repel'):
+            lengths = ['repel'] * len(i)
+        else:
+            lengths = np.broadcast_to(np.asarray(lengths, dtype='float64'), i.shape).tolist()
+
+        touched = set()
+        for a, b, length in zip(i.tolist(), j.tolist(), lengths):
+            if a == b:
+                continue
+            p1, p2 = particles[a], particles[b]
+            if p2 not in p1.link_lengths:
+                p1.linked.append(p2)
+            if p1 not in p2.link_lengths:
+                p2.linked.append(p1)
+            p1.link_lengths[p2] = length
+            p2.link_lengths[p1] = length
+            touched.add(p1)
+            touched.add(p2)
+
+        self.structure_changes += 1
+        for p in touched:
+            self.wake_island(p)
 
     def copy_selected(self):
-        self.clipboard = []
-        for p in self.selection:
-            dictionary = p.return_dict(index_source=self.selection)
-            dictionary['x'] -= self.mx
-            dictionary['y'] -= self.my
-            self.clipboard.append(dictionary)
+        # The clipboard holds one column per particle-setting and the links as index-pairs into these columns
+        particles = self.selection.copy()
+        indices = {p: i for i, p in enumerate(particles)}
+        edges = []
+        lengths = []
+        for i, p in enumerate(particles):
+            for link, length in p.link_lengths.items():
+                j = indices.get(link)
+                if j is not None and i < j:
+                    edges.append((i, j))
+                    lengths.append(length)
+
+        self.clipboard = {'x': np.array([p.x for p in particles], dtype='float64') - self.mx,
+                          'y': np.array([p.y for p in particles], dtype='float64') - self.my,
+                          'settings': {key: np.array([vars(p)[attribute] for p in particles])
+                                       for key, attribute in ATTRIBUTE_NAMES.items()},
+                          'edges': np.array(edges, dtype=int).reshape(-1, 2),
+                          'lengths': lengths}
 
     def paste(self):
+        if self.clipboard is None or len(self.clipboard['x']) == 0:
+            return
+
+        self.history.begin()
         self.pasting = True
-        temp_particles = []
-        for data in self.clipboard:
-            temp_particles.append(Particle(self, 0, 0, group=data['group']))
-
-        for i, data in enumerate(self.clipboard):
-            d = data.copy()
-            particle = temp_particles[i]
-            d['x'] += self.mx
-            d['y'] += self.my
-            for key, value in d.items():
-                try:
-                    vars(particle)[key] = value.copy()
-                except AttributeError:
-                    vars(particle)[key] = value
-
-            particle.init_constants()
-            particle.linked = [temp_particles[index] for index in particle.linked]
-            particle.link_lengths = {temp_particles[index]: value for index, value in
-                                     particle.link_lengths.items()}
+        particles = self.add_particles(self.clipboard['x'] + self.mx, self.clipboard['y'] + self.my,
+                                       **self.clipboard['settings'])
+
+        edges, lengths = self.clipboard['edges'], self.clipboard['lengths']
+        repel = np.array([length == 'repel' for length in lengths], dtype=bool)
+        if repel.any():
+            self.link_pairs(edges[repel, 0], edges[repel, 1], particles=particles)
+        if not repel.all():
+            self.link_pairs(edges[~repel, 0], edges[~repel, 1], [length for length in lengths if length != 'repel'],
+                            particles=particles)
+
+        for particle in particles:
             particle.mouse = True
-        self.selection = temp_particles
+        self.selection = particles
 
     def cut(self):
+        self.history.begin(self.selection)
         self.copy_selected()
-        temp = self.selection.copy()
-        for p in temp:
-            p.delete()
+        self.remove_particles(self.selection)
 
     def link_selection(self, fit_link=False):
+        self.history.begin(self.selection, neighbours=False)
         self.link(self.selection, fit_link=fit_link)
         self.selection = []
 
     def unlink_selection(self):
+        self.history.begin(self.selection, neighbours=False)
         self.unlink(self.selection)
         self.selection = []
 
@@ -407,60 +644,450 @@ class Simulation:
             p.linked.remove(p)
             del p.link_lengths[p]
 
+        self.structure_changes += 1
+        for p in particles:
+            self.wake_island(p)
+
     def unlink(self, particles):
         for p in particles:
             p.linked = [link for link in p.linked if link not in particles]
             p.link_lengths = {link: length for link, length in p.link_lengths.items() if link not in particles}
 
+        self.structure_changes += 1
+        for p in particles:
+            self.wake_island(p)
+
+    def break_links(self):
+        # Links that broke during the force-pass get removed together at its end, so the forces don't depend on the
+        # update-order and every particle's links are only rebuilt once
+        partners = {}
+        for p1, p2 in self.breaking_links:
+            partners.setdefault(p1, set()).add(p2)
+            partners.setdefault(p2, set()).add(p1)
+        self.breaking_links = []
+        if partners and any(p.mouse for p in self.particles):
+            # Links breaking during a drag belong to its history-entry, both ends have to be undone
+            self.history.touch(partners, neighbours=False)
+
+        for p, links in partners.items():
+            p.linked = [link for link in p.linked if link not in links]
+            p.link_lengths = {link: length for link, length in p.link_lengths.items() if link not in links}
+        if partners:
+            self.structure_changes += 1
+        for p in partners:
+            self.wake_island(p)
+        return sum(len(links) for links in partners.values()) // 2
+
+    def insert_particles(self, particles):
+        new_group = False
+        for p in particles:
+            try:
+                self.groups[p.group].append(p)
+            except KeyError:
+                self.groups[p.group] = [p]
+                if self.gui is not None:
+                    self.gui.group_indices.append(int(p.group.replace('group', '')))
+                new_group = True
+
+        if new_group and self.gui is not None:
+            self.gui.groups_entry['values'] = [f'group{i}' for i in sorted(self.gui.group_indices)]
+        self.particles.extend(particles)
+        self.history.inserted(particles)
+
+    def remove_particles(self, particles):
+        removed = set(particles)
+        if len(removed) == 0:
+            return
+        self.history.deleted(dict.fromkeys(particles))
+
+        self.particles = [p for p in self.particles if p not in removed]
+        self.structure_changes += 1
+        self.selection = [p for p in self.selection if p not in removed]
+        for group in {p.group for p in removed}:
+            self.groups[group] = [p for p in self.groups[group] if p not in removed]
+
+        for p in removed:
+            for link in p.linked:
+                if link not in removed:
+                    del link.link_lengths[p]
+                    link.linked.remove(p)
+                    self.wake_island(link)
+        # Pooled particles go back to their emitter, in the order they were removed
+        for p in dict.fromkeys(particles):
+            if p.pool is not None:
+                p.pool.append(p)
+
+    def despawn(self, particle):
+        self.despawned.append(particle)
+
+    def flush_despawned(self):
+        # Particles leaving the simulation get removed in a single pass, pooled ones are kept for reuse
+        if len(self.despawned) == 0:
+            return
+
+        despawned = dict.fromkeys(self.despawned)  # keeps the order, pooled particles get reused in it
+        self.despawned = []
+        self.remove_particles(despawned)
+
+    def update_emitters(self):
+        for emitter in self.emitters:
+            emitter.update()
+
+    def update_sinks(self):
+        if len(self.sinks) > 0 and len(self.particles) > 0:
+            positions = np.array([[p.x, p.y] for p in self.particles], dtype='float64')
+            for sink in self.sinks:
+                sink.update(positions)
+        self.flush_despawned()
+
+    def return_far_field_interval(self, particle):
+        return self.group_far_field_intervals.get(particle.group, self.far_field_interval)
+
+    def add_collider(self, collider):
+        self.colliders.append(collider)
+        return collider
+
+    def apply_colliders(self):
+        particles = [p for p in self.particles if not (p.locked or p.mouse or p.asleep)]
+        if len(self.colliders) == 0 or len(particles) == 0:
+            return
+
+        positions = np.array([[p.x, p.y] for p in particles], dtype='float64')
+        previous = positions - np.array([p.v for p in particles], dtype='float64') * self.speed
+        radii = np.array([p.r for p in particles], dtype='float64')
+        for collider in self.colliders:
+            collider.collide(particles, positions, previous, radii, self.ground_friction)
+        self.integrated = None
+
+    def return_island(self, particle):
+        island = {particle}
+        stack = [particle]
+        while stack:
+            for p in stack.pop().linked:
+                if p not in island:
+                    island.add(p)
+                    stack.append(p)
+
+        return island
+
+    def wake_island(self, particle):
+        if not particle.asleep and particle.still_frames == 0:
+            return
+        for p in self.return_island(particle):
+            p.asleep = False
+            p.still_frames = 0
+
+    def wake_all(self):
+        for p in self.particles:
+            p.asleep = False
+            p.still_frames = 0
+
+    def update_sleep(self):
+        settings = (self.g, tuple(self.g_dir), tuple(self.wind_force), self.air_res, self.ground_friction,
+                    self.temperature, self.speed, self.top, self.bottom, self.left, self.right, self.void_edges,
+                    self.allow_sleeping)
+        if settings != self.prev_settings:
+            self.wake_all()
+            self.prev_settings = settings
+
+        if self.allow_sleeping and not self.paused:
+            checked = set()
+            for particle in self.particles:
+                if particle.asleep or particle.still_frames < self.sleep_delay or particle in checked:
+                    continue
+
+                island = self.return_island(particle)
+                checked.update(island)
+                if all(p.still_frames >= self.sleep_delay for p in island):
+                    for p in island:
+                        p.asleep = True
+                        p.v *= 0
+                        p.forces = []
+                    self.integrated = None
+
+        self.sleeping_count = sum(p.asleep for p in self.particles) if self.allow_sleeping else 0
+
     def change_link_lengths(self, particles, amount):
         for p in particles:
             for link, value in p.link_lengths.items():
                 if value != 'repel':
                     self.link([p, link], fit_link=True, distance=value + amount)
 
+    def change_selection_link_lengths(self, amount):
+        self.change_link_lengths(self.selection, amount)
+
     def execute(self, code):
         try:
             exec(code)
         except Exception as error:
             self.error = ['Code-Error:', error]
 
-    def update_vars(self):
-        for var, entry in [('g', 'gravity_entry'), ('air_res', 'air_res_entry'), ('ground_friction', 'friction_entry'),
-                           ('use_grid', 'grid_bool'), ('min_spawn_delay', 'delay_entry'),
-                           ('calculate_radii_diff', 'calculate_radii_diff_bool')]:
-            try:
-                vars(self)[var] = float(eval(vars(self.gui)[entry].get()))
-            except:
-                pass
+    def return_substeps(self):
+        particles = [p for p in self.particles if not p.locked and not p.asleep]
+        if len(particles) == 0:
+            return 1
+
+        velocities = np.array([p.v for p in particles], dtype='float64')
+        accelerations = np.clip(np.array([p.a for p in particles], dtype='float64'), -2, 2)
+        v_max = np.sqrt(np.einsum('ij,ij->i', velocities, velocities).max())
+        a_max = np.sqrt(np.einsum('ij,ij->i', accelerations, accelerations).max())
+
+        length = min(p.r for p in particles)
+        for p in particles:
+            for value in p.link_lengths.values():
+                if value != 'repel' and 0 < value < length:
+                    length = value
+
+        displacement = v_max * self.speed + 0.5 * a_max * self.speed ** 2
+        substeps = math.ceil(displacement / (self.cfl * max(length, 1)))
+        return min(max(substeps, 1), self.max_substeps)
+
+    def update_constants(self):
+        # Only recalculated when one of the settings they depend on changed
+        key = (self.g, self.g_dir[0], self.g_dir[1], self.air_res, self.speed)
+        if key != self.constants_key:
+            self.g_vector = self.g_dir * self.g
+            self.air_res_calc = (1 - self.air_res) ** self.speed
+            self.constants_key = key
+
+    def step(self):
+        if self.recorder is not None:
+            self.recorder.update()
+        self.stepping = True
+        self.substeps = self.return_substeps() if self.adaptive_timestep and not self.paused else 1
+
+        speed = self.speed
+        self.speed = speed / self.substeps
+        self.update_constants()
+        self.broken_links = 0
+        for substep in range(self.substeps):
+            self.link_colors = []
+            if self.use_grid:
+                self.grid.init_grid()
 
-        self.temperature = self.gui.temp_sc.get()
-        self.speed = self.gui.speed_sc.get()
+            if not self.paused:
+                self.update_emitters()
+            updated = [particle for particle in self.particles if particle.update(self.grid)]
+            self.integrate(updated, substep == self.substeps - 1)
+            self.broken_links += self.break_links()
+            if not self.paused:
+                self.apply_colliders()
+                self.step_count += 1
+            self.update_sinks()
+        self.speed = speed
+        self.stepping = False
+
+        self.update_sleep()
+        if self.observables.enabled and not self.paused:
+            self.observables.update()
+        if self.shared_export is not None:
+            self.shared_export.publish()
+        if self.stream_server is not None and self.gui is None:
+            # Without a window, frames only get rendered when they are streamed
+            self.stream_server.publish()
+
+    def return_buffer(self, name, rows, columns, dtype=None):
+        dtype = self.precision if dtype is None else dtype
+        buffer = self.integration_buffers.get(name)
+        if buffer is None or len(buffer) < rows or buffer.shape[1] != columns or buffer.dtype != dtype:
+            buffer = np.zeros((max(rows * 2, 1024), columns), dtype=dtype)
+            self.integration_buffers[name] = buffer
+        return buffer[:rows]
+
+    def integrate(self, particles, last_substep=True):
+        # Gravity, wind, temperature, air resistance, movement and the edges of all updated particles at once,
+        # the particles only calculate their interactions
+        amount = len(particles)
+        if amount == 0:
+            return
+
+        state = self.return_buffer('state', amount, 12)
+        state[:] = [(p.x, p.y, *p.v.tolist(), *p.a.tolist(), p.m, p.r, p.bounciness, p.mouse, p.locked,
+                     p.still_frames) for p in particles]
+        position, velocity, acceleration = state[:, 0:2], state[:, 2:4], state[:, 4:6]
+        x, y, vx, vy = state[:, 0], state[:, 1], state[:, 2], state[:, 3]
+        mass, radius, bounciness, frames = state[:, 6], state[:, 7], state[:, 8], state[:, 11]
+        mouse, locked, moving, still, mask = self.return_buffer('flags', amount, 5, bool).T
+        np.not_equal(state[:, 9], 0, out=mouse)
+        np.not_equal(state[:, 10], 0, out=locked)
+        # The masked updates only write into these, nothing gets allocated per step
+        change = self.return_buffer('change', amount, 2)
+        column, other_column = self.return_buffer('columns', amount, 2).T
+        forces = self.return_buffer('forces', amount, 2, 'float64')
+
+        if not self.paused:
+            # Negative masses fall upwards
+            np.less(mass, 0, out=mask)
+            np.multiply(mask, -2.0, out=column)
+            column += 1
+            np.multiply(column[:, None], self.g_vector, out=forces)
+            acceleration += forces
+            np.abs(mass, out=column)
+            np.divide(radius, column, out=column)
+            np.multiply(column[:, None], self.wind_force, out=forces)
+            acceleration += forces
+
+            np.clip(acceleration, -2, 2, out=change)
+            if self.temperature != 0:
+                noise = self.rng.uniform(-1, 1, (amount, 2))
+                noise *= self.temperature
+                change += noise
+            change *= self.speed
+            np.logical_or(mouse, locked, out=moving)
+            np.logical_not(moving, out=moving)
+            np.add(velocity, change, out=velocity, where=moving[:, None])
+            np.multiply(velocity, self.air_res_calc, out=velocity, where=moving[:, None])
+            np.multiply(velocity, self.speed, out=change)
+            np.add(position, change, out=position, where=moving[:, None])
+
+            energy = other_column
+            np.einsum('ij,ij->i', velocity, velocity, out=energy)
+            np.abs(mass, out=column)
+            column *= 0.5
+            energy *= column
+            np.less(energy, self.sleep_threshold, out=mask)
+            np.logical_not(mouse, out=still)
+            np.logical_and(still, mask, out=still)
+            np.logical_or(still, locked, out=still)
+            # sleep_delay is in frames, a still particle only counts one up in the last substep of a frame
+            frames += last_substep
+            np.multiply(frames, still, out=frames)
+
+        friction = 1 - self.ground_friction
+        reflection = other_column
+        np.negative(bounciness, out=reflection)
+        if self.right:
+            np.add(x, radius, out=column)
+            np.greater_equal(column, self.width, out=mask)
+            np.multiply(vx, reflection, out=vx, where=mask)
+            np.multiply(vy, friction, out=vy, where=mask)
+            np.subtract(self.width, radius, out=x, where=mask)
+        if self.left:
+            np.subtract(x, radius, out=column)
+            np.less_equal(column, 0, out=mask)
+            np.multiply(vx, reflection, out=vx, where=mask)
+            np.multiply(vy, friction, out=vy, where=mask)
+            np.copyto(x, radius, where=mask)
+        if self.bottom:
+            np.add(y, radius, out=column)
+            np.greater_equal(column, self.height, out=mask)
+            np.multiply(vy, reflection, out=vy, where=mask)
+            np.multiply(vx, friction, out=vx, where=mask)
+            np.subtract(self.height, radius, out=y, where=mask)
+        if self.top:
+            np.subtract(y, radius, out=column)
+            np.less_equal(column, 0, out=mask)
+            np.multiply(vy, reflection, out=vy, where=mask)
+            np.multiply(vx, friction, out=vx, where=mask)
+            np.copyto(y, radius, where=mask)
+
+        # The particles still keep their own state, so it gets gathered from and written back to them
+        for p, (px, py, pvx, pvy, pax, pay, *_, still_frames) in zip(particles, state.tolist()):
+            p.x, p.y = px, py
+            p.v[0], p.v[1] = pvx, pvy
+            p.a[0], p.a[1] = pax, pay
+            p.still_frames = int(still_frames)
+        self.integrated = particles
+
+        if self.void_edges:
+            gone = (x - radius >= self.width) | (x + radius <= 0) | (y - radius >= self.height) | (y + radius <= 0)
+            for i in np.flatnonzero(gone):
+                self.despawn(particles[i])
+
+    def return_visible(self):
+        # Particles overlapping the canvas, taken from the grid-cells around it if the grid covers the view
+        x0, y0, x1, y1 = self.camera.return_view()
+        inside = x0 >= 0 and y0 >= 0 and x1 <= self.width and y1 <= self.height
+        if (inside or not self.grid.bounded) and self.use_grid and self.grid.grid is not None:
+            # One extra cell on every side for particles that moved since the grid was built
+            candidates = self.grid.return_particles_in(x0 - self.grid.column_width, y0 - self.grid.row_height,
+                                                       x1 + self.grid.column_width, y1 + self.grid.row_height)
+        else:
+            candidates = self.particles
+
+        return [p for p in candidates if p.x + p.r >= x0 and p.x - p.r <= x1 and p.y + p.r >= y0 and p.y - p.r <= y1]
+
+    def render(self, show_links=True):
+        image = np.full((self.canvas_height, self.canvas_width, 3), self.bg_color[0], dtype=np.uint8)
+        to_screen = self.camera.to_screen
+        zoom = self.camera.zoom
+        visible = self.return_visible()
+        lod = len(visible) > self.lod_threshold or zoom < self.lod_zoom
+
+        if show_links and not lod:
+            if self.stress_visualization and not self.paused:
+                visible_set = set(visible)
+                for p1, p2, percentage in self.link_colors:
+                    if p1 in visible_set or p2 in visible_set:
+                        color = [max(255 * percentage, 235)] + [235 * (1 - percentage)] * 2
+                        cv2.line(image, to_screen(p1.x, p1.y), to_screen(p2.x, p2.y), color, 1)
+            else:
+                for p1 in visible:
+                    for p2 in p1.linked:
+                        cv2.line(image, to_screen(p1.x, p1.y), to_screen(p2.x, p2.y), [235] * 3, 1)
 
-        self.top = self.gui.top_bool.get()
-        self.bottom = self.gui.bottom_bool.get()
-        self.left = self.gui.left_bool.get()
-        self.right = self.gui.right_bool.get()
-        self.use_grid = self.gui.grid_bool.get()
-        self.calculate_radii_diff = self.gui.calculate_radii_diff_bool.get()
+        for obj in self.colliders + self.emitters + self.sinks:
+            obj.draw(image, self.camera)
+
+        if lod:
+            self.splat(image, visible)
+        else:
+            for particle in visible:
+                cv2.circle(image, to_screen(particle.x, particle.y), max(int(particle.r * zoom), 1), particle.color, -1)
+
+        for particle in self.selection:
+            cv2.circle(image, to_screen(particle.x, particle.y), max(int(particle.r * zoom), 1), [0, 0, 255], 2)
+
+        if self.gui is not None:
+            cv2.circle(image, to_screen(self.mx, self.my), int(self.mr * zoom), [127] * 3)
+
+        return image
+
+    def splat(self, image, particles):
+        # Every particle adds its color to the block of pixels it falls into (about the size of a particle on screen),
+        # a block then shows the average color or, with lod_mode='density', how many particles it holds
+        if len(particles) == 0:
+            return
+        data = np.array([(p.x, p.y, p.r, *p.color) for p in particles], dtype='float64')
+        x, y, radius, colors = data[:, 0], data[:, 1], data[:, 2], data[:, 3:6]
+
+        block = max(int(np.median(radius) * self.camera.zoom), 1)
+        rows, columns = -(-self.canvas_height // block), -(-self.canvas_width // block)
+        row = ((y - self.camera.y) * self.camera.zoom // block).astype(int)
+        column = ((x - self.camera.x) * self.camera.zoom // block).astype(int)
+        inside = (row >= 0) & (row < rows) & (column >= 0) & (column < columns)
+        index = (row * columns + column)[inside]
+
+        counts = np.bincount(index, minlength=rows * columns)
+        occupied = counts > 0
+        if self.lod_mode == 'density':
+            levels = np.log1p(counts) / np.log1p(max(counts.max(), 1)) * 255
+            blocks = cv2.applyColorMap(levels.astype(np.uint8).reshape(-1, 1), cv2.COLORMAP_INFERNO)
+            blocks = blocks.reshape(-1, 3)[:, ::-1]
+        else:
+            colors = colors[inside]
+            blocks = np.zeros((rows * columns, 3))
+            for channel in range(3):
+                blocks[:, channel] = np.bincount(index, colors[:, channel], rows * columns)
+            blocks[occupied] /= counts[occupied, None]
+
+        layer = blocks.reshape(rows, columns, 3).astype(np.uint8)
+        mask = occupied.reshape(rows, columns)
+        if block > 1:
+            layer = np.repeat(np.repeat(layer, block, axis=0), block, axis=1)
+            mask = np.repeat(np.repeat(mask, block, axis=0), block, axis=1)
+        mask = mask[:self.canvas_height, :self.canvas_width]
+        image[mask] = layer[:self.canvas_height, :self.canvas_width][mask]
 
     def simulate(self):
         while self.running:
             self.gui.canvas.delete("all")
-            image = np.full((self.height, self.width, 3), self.bg_color[0])
-            self.link_colors = []
 
-            self.update_vars()
-            self.g_vector = self.g_dir * self.g
-            self.air_res_calc = (1 - self.air_res) ** self.speed
-            if self.gui.grid_bool.get():
-                self.grid.init_grid()
             if self.toggle_pause:
-                self.paused = not self.paused
+                self.run_action('set_paused', not self.paused)
                 self.gui.pause_button.config(image=self.gui.play_photo if self.paused else self.gui.pause_photo)
-
-                if not self.paused:
-                    self.selection = []
                 self.toggle_pause = False
+            self.run_actions()
 
             if self.mouse_down and time.time() - self.mouse_down_start >= self.min_hold_delay:
                 event = Event()
@@ -484,27 +1111,14 @@ class Simulation:
             if self.start_load:
                 self.save_manager.load()
                 self.start_load = False
+            self.save_manager.autosave()
 
-            for particle in self.particles:
-                particle.update(self.grid)
-
-            if self.gui.show_links.get():
-                if self.stress_visualization and not self.paused:
-                    for p1, p2, percentage in self.link_colors:
-                        color = [max(255 * percentage, 235)] + [235 * (1 - percentage)] * 2
-                        cv2.line(image, (int(p1.x), int(p1.y)), (int(p2.x), int(p2.y)), color, 1)
-                else:
-                    for p1 in self.particles:
-                        for p2 in p1.linked:
-                            cv2.line(image, (int(p1.x), int(p1.y)), (int(p2.x), int(p2.y)), [235] * 3, 1)
-
-            for particle in self.particles:
-                cv2.circle(image, (int(particle.x), int(particle.y)), particle.r, particle.color, -1)
+            self.step()
 
-            for particle in self.selection:
-                cv2.circle(image, (int(particle.x), int(particle.y)), particle.r, [0, 0, 255], 2)
-
-            cv2.circle(image, (self.mx, self.my), int(self.mr), [127] * 3)
+            self.camera.update()
+            image = self.render(self.show_links)
+            if self.stream_server is not None:
+                self.stream_server.publish(image)
 
             if time.time() - self.start_time >= self.fps_update_delay:
                 try:
@@ -516,15 +1130,26 @@ class Simulation:
 
             photo = PIL.ImageTk.PhotoImage(image=PIL.Image.fromarray(image.astype(np.uint8)), master=self.gui.tk)
             self.gui.canvas.create_image(0, 0, image=photo, anchor=NW)
-            if self.gui.show_fps.get():
-                self.gui.canvas.create_text(10, 10, text=f"FPS: {round(self.fps, 2)}", anchor='nw',
+            if self.show_fps:
+                text = f"FPS: {round(self.fps, 2)}"
+                if self.adaptive_timestep:
+                    text += f" (substeps: {self.substeps})"
+                self.gui.canvas.create_text(10, 10, text=text, anchor='nw',
                                         font=('Helvetica', 9, 'bold'))
-            if self.gui.show_num.get():
-                self.gui.canvas.create_text(10, 25, text=f"Particles: {len(self.particles)}", anchor='nw',
+            if self.show_num:
+                text = f"Particles: {len(self.particles)}"
+                if self.allow_sleeping:
+                    text += f" (sleeping: {self.sleeping_count})"
+                self.gui.canvas.create_text(10, 25, text=text, anchor='nw',
                                         font=('Helvetica', 9, 'bold'))
 
             self.prev_mx, self.prev_my = self.mx, self.my
-            self.mx = self.gui.tk.winfo_pointerx() - self.gui.tk.winfo_rootx()
-            self.my = self.gui.tk.winfo_pointery() - self.gui.tk.winfo_rooty() - 30
+            self.mx, self.my = self.camera.to_world(self.gui.tk.winfo_pointerx() - self.gui.tk.winfo_rootx(),
+                                                    self.gui.tk.winfo_pointery() - self.gui.tk.winfo_rooty() - 30)
 
             self.gui.update()
+
+            if 'first_frame' not in self.startup_times:
+                self.startup_times['first_frame'] = time.perf_counter() - IMPORT_START
+                if self.startup_report:
+                    print('Startup: ' + ', '.join(f'{key} {value:.3f}s' for key, value in self.startup_times.items()))
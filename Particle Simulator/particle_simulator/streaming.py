@@ -0,0 +1,200 @@
+from particle_simulator import *
+import socket
+import struct
+import json
+import zlib
+
+
+# Every message: header-size and payload-size (4 bytes each), a JSON-header and the payload
+def send_message(connection, header, payload=b''):
+    header = json.dumps(header).encode()
+    connection.sendall(struct.pack('!II', len(header), len(payload)) + header + payload)
+
+
+def receive_exactly(connection, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = connection.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError('Stream closed')
+        data.extend(chunk)
+    return bytes(data)
+
+
+def receive_message(connection):
+    header_size, payload_size = struct.unpack('!II', receive_exactly(connection, 8))
+    header = json.loads(receive_exactly(connection, header_size))
+    return header, receive_exactly(connection, payload_size)
+
+
+class Subscriber:
+    # Each client only ever gets the newest message, the ones it was too slow for get dropped
+    def __init__(self, server, connection):
+        self.server = server
+        self.connection = connection
+        self.message = None
+        self.dropped = 0
+        self.condition = threading.Condition()
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def push(self, message):
+        with self.condition:
+            if self.message is not None:
+                self.dropped += 1
+            self.message = message
+            self.condition.notify()
+
+    def run(self):
+        try:
+            while self.server.running:
+                with self.condition:
+                    while self.message is None and self.server.running:
+                        self.condition.wait(0.5)
+                    message, self.message = self.message, None
+                if message is not None:
+                    send_message(self.connection, *message)
+        except OSError:
+            pass
+        finally:
+            self.connection.close()
+            self.server.remove(self)
+
+
+class StreamServer:
+    # mode 'frames' sends the rendered canvas as jpg/png, mode 'arrays' the positions, colors and radii
+    def __init__(self, sim, host='127.0.0.1', port=5005, mode='frames', image_format='.jpg', quality=80,
+                 max_fps=30):
+        self.sim = sim
+        self.mode = mode
+        self.image_format = image_format
+        self.quality = quality
+        self.max_fps = max_fps
+
+        self.socket = socket.create_server((host, port))
+        self.subscribers = []
+        self.lock = threading.Lock()
+        self.running = True
+        self.last_publish = 0
+        self.frame = None
+        self.condition = threading.Condition()
+
+        threading.Thread(target=self.accept, daemon=True).start()
+        threading.Thread(target=self.encode, daemon=True).start()
+        self.sim.stream_server = self
+
+    def accept(self):
+        while self.running:
+            try:
+                connection, _ = self.socket.accept()
+            except OSError:
+                break
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self.lock:
+                self.subscribers.append(Subscriber(self, connection))
+
+    def remove(self, subscriber):
+        with self.lock:
+            if subscriber in self.subscribers:
+                self.subscribers.remove(subscriber)
+
+    def publish(self, image=None):
+        # Called every frame, only hands the newest state over to the encoding-thread
+        if len(self.subscribers) == 0 or time.time() - self.last_publish < 1 / self.max_fps:
+            return
+        self.last_publish = time.time()
+
+        header = {'step': self.sim.step_count, 'width': self.sim.width, 'height': self.sim.height}
+        if self.mode == 'frames':
+            data = self.sim.render() if image is None else image
+            header.update(width=self.sim.canvas_width, height=self.sim.canvas_height)
+        else:
+            particles = self.sim.particles
+            data = {'positions': np.array([[p.x, p.y] for p in particles], dtype='float32').reshape(-1, 2),
+                    'colors': np.array([p.color for p in particles], dtype='uint8').reshape(-1, 3),
+                    'radii': np.array([p.r for p in particles], dtype='float32')}
+
+        with self.condition:
+            self.frame = (header, data)
+            self.condition.notify()
+
+    def encode(self):
+        while self.running:
+            with self.condition:
+                while self.frame is None and self.running:
+                    self.condition.wait(0.5)
+                frame, self.frame = self.frame, None
+            if frame is None:
+                continue
+
+            header, data = frame
+            if self.mode == 'frames':
+                image = cv2.cvtColor(data, cv2.COLOR_RGB2BGR)
+                parameters = [cv2.IMWRITE_JPEG_QUALITY, self.quality] if self.image_format == '.jpg' else []
+                payload = cv2.imencode(self.image_format, image, parameters)[1].tobytes()
+                header.update(type='frame', format=self.image_format)
+            else:
+                payload = zlib.compress(b''.join(array.tobytes() for array in data.values()), 1)
+                header.update(type='arrays',
+                              arrays=[[name, array.dtype.str, array.shape] for name, array in data.items()])
+
+            with self.lock:
+                subscribers = self.subscribers.copy()
+            for subscriber in subscribers:
+                subscriber.push((header, payload))
+
+    def stop(self):
+        self.running = False
+        self.socket.close()
+        with self.condition:
+            self.condition.notify_all()
+        with self.lock:
+            for subscriber in self.subscribers:
+                subscriber.connection.close()
+        self.sim.stream_server = None
+
+
+class StreamClient:
+    def __init__(self, host='127.0.0.1', port=5005):
+        self.connection = socket.create_connection((host, port))
+
+    def receive(self):
+        # Returns the header and either the frame (BGR) or a dictionary of arrays
+        header, payload = receive_message(self.connection)
+        if header['type'] == 'frame':
+            return header, cv2.imdecode(np.frombuffer(payload, np.uint8), cv2.IMREAD_COLOR)
+
+        payload = zlib.decompress(payload)
+        arrays = {}
+        offset = 0
+        for name, dtype, shape in header['arrays']:
+            array = np.frombuffer(payload, dtype, int(np.prod(shape)), offset).reshape(shape)
+            offset += array.nbytes
+            arrays[name] = array
+        return header, arrays
+
+    def close(self):
+        self.connection.close()
+
+
+def view(host='127.0.0.1', port=5005):
+    client = StreamClient(host, port)
+    try:
+        while True:
+            header, data = client.receive()
+            if header['type'] == 'frame':
+                image = data
+            else:
+                image = np.full((header['height'], header['width'], 3), 255, dtype=np.uint8)
+                for (x, y), color, r in zip(data['positions'].tolist(), data['colors'][:, ::-1].tolist(),
+                                            data['radii'].tolist()):
+                    cv2.circle(image, (int(x), int(y)), int(r), color, -1)
+
+            cv2.imshow('Particle Simulator - Stream', image)
+            # ESC to close
+            if cv2.waitKey(1) == 27:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        client.close()
+        cv2.destroyAllWindows()
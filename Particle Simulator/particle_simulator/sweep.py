@@ -0,0 +1,85 @@
+from particle_simulator import *
+import multiprocessing
+import itertools
+import csv
+
+
+def load_headless(filename, width=650, height=600, gridres=(50, 50)):
+    sim = Simulation(width=width, height=height, gridres=gridres, headless=True)
+    sim.save_manager.apply_data(sim.save_manager.read(filename))
+    return sim
+
+
+def set_parameter(sim, key, value):
+    # Particle-settings (eg. 'attraction_strength') are set for all particles, everything else on the simulation
+    if key in ATTRIBUTE_NAMES:
+        for p in sim.particles:
+            vars(p)[ATTRIBUTE_NAMES[key]] = value
+            p.init_constants()
+    elif key in vars(sim):
+        vars(sim)[key] = value
+    else:
+        raise ValueError(f"Unknown parameter '{key}'")
+
+
+def count_links(sim):
+    return sum(len(p.linked) for p in sim.particles) // 2
+
+
+def kinetic_energy(sim):
+    return float(sum(0.5 * abs(p.m) * (p.v[0] ** 2 + p.v[1] ** 2) for p in sim.particles))
+
+
+OBSERVABLES = {'positions': lambda sim: np.array([[p.x, p.y] for p in sim.particles], dtype=sim.precision),
+               'velocities': lambda sim: np.array([p.v for p in sim.particles], dtype=sim.precision),
+               'kinetic_energy': kinetic_energy,
+               'links': count_links,
+               'particles': lambda sim: len(sim.particles)}
+
+
+def run_single(filename, parameters, steps=100, observables=('kinetic_energy', 'broken_links'), seed=None,
+               **kwargs):
+    sim = load_headless(filename, **kwargs)
+    if seed is not None:
+        sim.set_seed(seed)
+    for key, value in parameters.items():
+        set_parameter(sim, key, value)
+
+    sim.paused = False
+    links = count_links(sim)
+    for _ in range(steps):
+        sim.step()
+
+    row = dict(parameters)
+    for name in observables:
+        if callable(name):
+            row[name.__name__] = name(sim)
+        elif name == 'broken_links':
+            row[name] = links - count_links(sim)
+        else:
+            row[name] = OBSERVABLES[name](sim)
+
+    return row
+
+
+def run_sweep(filename, parameters, steps=100, observables=('kinetic_energy', 'broken_links'), seed=None,
+              processes=None, **kwargs):
+    # Every combination of the parameter values gets simulated in its own process, eg.
+    # run_sweep('scene.sim', {'temperature': [0, 0.5, 1], 'g': [0.1, 0.2]}, steps=500)
+    # Custom observables have to be functions of the simulation defined at module-level (to be picklable)
+    keys = list(parameters)
+    combinations = [dict(zip(keys, values)) for values in itertools.product(*(parameters[key] for key in keys))]
+    arguments = [(filename, combination, steps, observables, seed) for combination in combinations]
+
+    with multiprocessing.Pool(processes) as pool:
+        results = [pool.apply_async(run_single, args, kwargs) for args in arguments]
+        return [result.get() for result in results]
+
+
+def write_csv(rows, filename):
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    with open(filename, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow([np.asarray(row[key]).tolist() if key in row else '' for key in columns])